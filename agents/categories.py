@@ -0,0 +1,113 @@
+import re
+from typing import Dict, Iterable, List, Optional
+
+
+# -----------------------------------------------------------
+# DEAL TAXONOMY
+# -----------------------------------------------------------
+# Checked in order: when a text mentions several categories,
+# the one listed first wins (a "gaming mobile" is a Mobile).
+TAXONOMY: Dict[str, List[str]] = {
+    "Mobiles": ["iphone", "mobile", "smartphone", "android", "galaxy"],
+    "Laptops": ["laptop", "macbook", "notebook", "ultrabook"],
+    "Headphones": ["headphone", "earphone", "earbud", "airpods"],
+    "Gaming": ["gaming", "ps5", "xbox", "controller", "gpu", "rtx"],
+    "Clothing": ["jeans", "shirt", "dress", "tshirt", "apparel"],
+    "Smartwatches": ["watch", "smartwatch"],
+    "TVs": ["tv", "television"],
+    "Cameras": ["camera", "dslr"],
+    "Home & Kitchen": ["home", "kitchen", "cookware", "appliance"],
+}
+
+DEFAULT_CATEGORY = "Others"
+
+
+# -----------------------------------------------------------
+# VECTOR STORE CATEGORIES
+# -----------------------------------------------------------
+# The product vector store is tagged with Amazon categories (its
+# `category` metadata). A deal domain maps to the ones its products are
+# filed under; a domain missing here (Clothing, Others) has no matching
+# products and is searched across the whole store.
+STORE_CATEGORIES: Dict[str, List[str]] = {
+    "Mobiles": ["Cell_Phones_and_Accessories"],
+    "Laptops": ["Electronics"],
+    "Headphones": ["Electronics", "Cell_Phones_and_Accessories"],
+    "Gaming": ["Electronics", "Toys_and_Games"],
+    "Smartwatches": ["Electronics", "Cell_Phones_and_Accessories"],
+    "TVs": ["Electronics"],
+    "Cameras": ["Electronics"],
+    "Home & Kitchen": ["Appliances", "Tools_and_Home_Improvement"],
+}
+
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    """
+    Build a regex alternation that shares common prefixes, e.g.
+    ["earbud", "earphone"] -> "ear(?:bud|phone)". The engine then tries each
+    letter once instead of every keyword at every position, so matching stays
+    linear in the text even with thousands of keywords.
+    """
+    trie: Dict = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: Dict) -> Optional[str]:
+        branches = [re.escape(ch) + (build(child) or "") for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return None
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            return "(?:" + body + ")?"
+        return body
+
+    return build(trie) or ""
+
+
+class DomainClassifier:
+    """
+    Keyword classifier compiled once into a single regex.
+    Keywords match on word starts and may carry a plural ending, so
+    "tv" matches "TV" and "TVs" but not the letters inside "activity",
+    while model numbers such as "iphone15" still match.
+    """
+
+    def __init__(self, taxonomy: Dict[str, List[str]] = TAXONOMY, default: str = DEFAULT_CATEGORY):
+        self.default = default
+        self.priority: Dict[str, int] = {}
+        self.category_of: Dict[str, str] = {}
+        for rank, (category, keywords) in enumerate(taxonomy.items()):
+            self.priority[category] = rank
+            for keyword in keywords:
+                keyword = keyword.lower()
+                # a keyword listed twice belongs to its first category
+                self.category_of.setdefault(keyword, category)
+        pattern = _trie_pattern(self.category_of)
+        self.regex = re.compile(rf"(?<![a-z0-9])({pattern})(?:s|es)?(?![a-z])")
+
+    def classify(self, text: str) -> str:
+        best = None
+        for match in self.regex.finditer(text.lower()):
+            category = self.category_of[match.group(1)]
+            if best is None or self.priority[category] < self.priority[best]:
+                best = category
+                if self.priority[best] == 0:
+                    break
+        return best or self.default
+
+    def classify_many(self, texts: Iterable[str]) -> List[str]:
+        classify = self.classify
+        return [classify(text) for text in texts]
+
+
+domain_classifier = DomainClassifier()
+
+
+def store_categories(domain: Optional[str]) -> List[str]:
+    """
+    The vector store categories to search for a deal domain; empty means all
+    """
+    return STORE_CATEGORIES.get(domain, [])
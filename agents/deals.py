@@ -1,12 +1,20 @@
 from pydantic import BaseModel
-from typing import List, Dict, Self
+from typing import Callable, Iterator, List, Dict, Optional, Self
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from bs4 import BeautifulSoup
 import re
+import html
 import feedparser
 from tqdm import tqdm
-import requests
-import time
 import logging
+from agents.fetching import Fetcher
+from agents.feed_cache import FeedCache
+from agents.detail_cache import DetailCache
+from agents.html_extract import get_extractor
+from agents.categories import domain_classifier
+from agents.rss import parse_entries, UnsupportedFeed, ParseError
+from agents.dedup import Deduplicator, dedupe
+from agents.feed_scheduler import FeedScheduler
 
 # -----------------------------------------------------------
 # INDIA RSS DEAL FEEDS
@@ -30,46 +38,37 @@ feeds = [
 logger = logging.getLogger("ScrapedDeal")
 logger.setLevel(logging.INFO)
 
+# Backend used to pull the description out of deal pages: lxml when
+# installed, else html.parser. Swap with get_extractor("soup") if needed.
+page_extractor = get_extractor()
+
 
 # -----------------------------------------------------------
 # DOMAIN DETECTOR (Category Classifier)
 # -----------------------------------------------------------
 def classify_domain(text: str) -> str:
-    t = text.lower()
-
-    if any(x in t for x in ["iphone", "mobile", "smartphone", "android", "galaxy"]):
-        return "Mobiles"
-    if any(x in t for x in ["laptop", "macbook", "notebook", "ultrabook"]):
-        return "Laptops"
-    if any(x in t for x in ["headphone", "earphone", "earbud", "airpods"]):
-        return "Headphones"
-    if any(x in t for x in ["gaming", "ps5", "xbox", "controller", "gpu", "rtx"]):
-        return "Gaming"
-    if any(x in t for x in ["jeans", "shirt", "dress", "tshirt", "apparel"]):
-        return "Clothing"
-    if any(x in t for x in ["watch", "smartwatch"]):
-        return "Smartwatches"
-    if any(x in t for x in ["tv", "television"]):
-        return "TVs"
-    if any(x in t for x in ["camera", "dslr"]):
-        return "Cameras"
-    if any(x in t for x in ["home", "kitchen", "cookware", "appliance"]):
-        return "Home & Kitchen"
-
-    return "Others"
+    return domain_classifier.classify(text)
+
+
+def classify_many(texts: List[str]) -> List[str]:
+    return domain_classifier.classify_many(texts)
 
 
 # -----------------------------------------------------------
 # CLEAN HTML SNIPPET FROM RSS
 # -----------------------------------------------------------
 def extract(html_snippet: str) -> str:
+    # Most feeds (reddit included) have no snippet div: skip the parser entirely
+    if "snippet summary" not in html_snippet:
+        return html_snippet.replace('\n', ' ')
+
     soup = BeautifulSoup(html_snippet, 'html.parser')
     snippet_div = soup.find('div', class_='snippet summary')
 
     if snippet_div:
+        # Escaped markup inside the text is stripped without a second parse
         description = snippet_div.get_text(strip=True)
-        description = BeautifulSoup(description, 'html.parser').get_text()
-        description = re.sub('<[^<]+?>', '', description)
+        description = html.unescape(re.sub('<[^<]+?>', '', description))
         result = description.strip()
     else:
         result = html_snippet
@@ -93,6 +92,14 @@ def extract_indian_price(text: str):
     return None
 
 
+def extract_indian_prices(text: str) -> List[float]:
+    """
+    Every distinct rupee amount in the text, in order of appearance
+    """
+    amounts = re.findall(r"(?:₹|Rs\.?|INR)\s*([\d,]*\d)", text, re.IGNORECASE)
+    return list(dict.fromkeys(float(amount.replace(",", "")) for amount in amounts))
+
+
 # -----------------------------------------------------------
 # SCRAPED DEAL CLASS
 # -----------------------------------------------------------
@@ -105,7 +112,14 @@ class ScrapedDeal:
     features: str
     raw_price: float | None
 
+    hydrated: bool
+    page_fetched: bool   # False when hydration fell back to the feed summary
+
     def __init__(self, entry: Dict[str, str]):
+        """
+        Cheap construction from a feed entry - no network I/O.
+        Until hydrate() is called the deal falls back to its RSS summary.
+        """
         self.title = entry.get("title", "").strip()
         self.summary = extract(entry.get("summary", "") or entry.get("description", ""))
 
@@ -114,40 +128,37 @@ class ScrapedDeal:
         else:
             self.url = entry.get("link", "")
 
-        self.details = ""
+        self.details = self.summary
         self.features = ""
-        self.raw_price = None
+        self.raw_price = extract_indian_price(self.summary)
+        self.hydrated = False
+        self.page_fetched = False
 
         # CATEGORY ASSIGNMENT BASED ON TITLE
         self.category = classify_domain(self.title + " " + self.summary)
 
+    def hydrate(self, fetcher: Optional[Fetcher] = None,
+                detail_cache: Optional[DetailCache] = None) -> Self:
+        """
+        Download the deal page and fill in details, features and raw_price.
+        On any failure the summary fallback set in __init__ is kept.
+        With a detail_cache, pages extracted on an earlier run are not downloaded again.
+        """
+        cached = detail_cache.get(self.url) if detail_cache is not None else None
+        if cached:
+            self.details = cached["details"]
+            self.features = cached["features"]
+            self.raw_price = cached["raw_price"]
+            self.hydrated = True
+            self.page_fetched = True
+            return self
+
+        fetcher = fetcher or Fetcher()
         try:
-            headers = {
-                "User-Agent":
-                    "Mozilla/5.0"
-            }
-            r = requests.get(self.url, headers=headers, timeout=10)
-            soup = BeautifulSoup(r.content, "html.parser")
-
-            candidates = [
-                soup.find("div", {"class": "deal-desc"}),
-                soup.find("div", {"class": "content-section"}),
-                soup.find("div", {"class": "description"}),
-                soup.find("div", {"id": "content"}),
-                soup.find("article"),
-                soup.find("div", {"class": "post-content"}),
-                soup.find("div", {"class": "entry-content"}),
-            ]
-
-            node = next((x for x in candidates if x), None)
-
-            if node:
-                content = node.get_text(" ", strip=True)
-            else:
-                meta = soup.find("meta", {"name": "description"}) or \
-                       soup.find("meta", {"property": "og:description"})
-
-                content = meta.get("content", "") if meta else self.summary
+            r = fetcher.get(self.url)
+            content = page_extractor.extract(r.content)
+            if content is None:
+                content = self.summary
 
             content = re.sub(r"\s+", " ", content).strip()
 
@@ -165,21 +176,39 @@ class ScrapedDeal:
                     or None
             )
 
-        except Exception:
+            if detail_cache is not None:
+                detail_cache.put(self.url, self.details, self.features, self.raw_price)
+            self.page_fetched = True
+
+        except Exception as e:
+            logger.debug(f"Using the feed summary for {self.url}: {e}")
             self.details = self.summary
             self.features = ""
             self.raw_price = extract_indian_price(self.summary)
 
+        self.hydrated = True
+        return self
+
     def __repr__(self):
         return f"<{self.title}>"
 
-    def describe(self):
+    def describe(self, max_chars: Optional[int] = None):
+        """
+        :param max_chars: optional budget for the whole description; details
+            and features are shortened to fit, the other fields are kept whole
+        """
+        details, features = self.details, self.features
+        if max_chars is not None:
+            fixed = len(self.title) + len(self.category) + len(self.url) + 80
+            room = max(max_chars - fixed, 0)
+            details = details[:room]
+            features = features[:max(room - len(details), 0)]
         return (
             f"Title: {self.title}\n"
             f"Category: {self.category}\n"
             f"Raw Price: {self.raw_price}\n"
-            f"Details: {self.details}\n"
-            f"Features: {self.features}\n"
+            f"Details: {details}\n"
+            f"Features: {features}\n"
             f"URL: {self.url}"
         )
 #hello code
@@ -188,25 +217,186 @@ class ScrapedDeal:
 # FETCH ALL DEALS
 # -----------------------------------------------------------
     @classmethod
-    def fetch(cls, show_progress: bool = False) -> List[Self]:
+    def fetch_entries(cls, show_progress: bool = False, max_workers: int = 8,
+                      fetcher: Optional[Fetcher] = None,
+                      feed_cache: Optional[FeedCache] = None,
+                      scheduler: Optional[FeedScheduler] = None) -> List[Self]:
+        """
+        Phase 1: download the feeds and build un-hydrated deals.
+        Only the feeds are requested here, never the deal pages.
+        With a feed_cache, unchanged feeds are answered from the cache.
+        With a scheduler, only the feeds that are due are polled.
+        """
+        fetcher = fetcher or Fetcher()
         deals = []
-        feed_iter = tqdm(feeds) if show_progress else feeds
 
-        for feed_url in feed_iter:
-            try:
-                feed = feedparser.parse(feed_url)
-            except:
-                continue
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            feed_futures = [
+                pool.submit(read_feed, url, fetcher, feed_cache=feed_cache, scheduler=scheduler)
+                for url in due_feeds(scheduler)
+            ]
+            feed_iter = tqdm(feed_futures) if show_progress else feed_futures
+
+            for future in feed_iter:
+                for entry in future.result():
+                    try:
+                        deals.append(cls(entry))
+                    except Exception as e:
+                        logger.warning(f"Skipping feed entry: {e}")
+
+        if feed_cache:
+            feed_cache.save()
+        if scheduler:
+            scheduler.save()
+        return deals
 
-            for entry in feed.entries[:10]:
-                try:
-                    deals.append(cls(entry))
-                except:
-                    pass
+    @staticmethod
+    def hydrate_all(deals: List["ScrapedDeal"], max_workers: int = 8,
+                    fetcher: Optional[Fetcher] = None,
+                    detail_cache: Optional[DetailCache] = None) -> List["ScrapedDeal"]:
+        """
+        Phase 2: download the detail pages of the given deals on a thread pool.
+        max_workers is the global concurrency cap; the fetcher's limiter
+        throttles each host on its own.
+        """
+        fetcher = fetcher or Fetcher()
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return list(pool.map(lambda deal: deal.hydrate(fetcher, detail_cache), deals))
 
-                time.sleep(0.4)
+    @classmethod
+    def fetch(cls, show_progress: bool = False, max_workers: int = 8,
+              fetcher: Optional[Fetcher] = None,
+              seen: Optional[Callable[[str], bool]] = None,
+              feed_cache: Optional[FeedCache] = None,
+              detail_cache: Optional[DetailCache] = None,
+              collapse_duplicates: bool = True,
+              scheduler: Optional[FeedScheduler] = None) -> List[Self]:
+        """
+        Fetch feed entries, collapse the same deal listed by several feeds,
+        drop the ones `seen` already knows about, then hydrate only the
+        survivors. max_workers=1 walks the feeds one by one like the
+        original scraper.
+        :param seen: predicate on a deal URL; True means skip the deal
+        :param collapse_duplicates: keep one copy of deals sharing a canonical
+            URL or a near-identical title
+        :param scheduler: poll only the feeds whose adaptive interval has elapsed
+        """
+        fetcher = fetcher or Fetcher()
+        deals = cls.fetch_entries(show_progress, max_workers, fetcher, feed_cache, scheduler)
+        if collapse_duplicates:
+            deals = dedupe(deals)
+        if seen:
+            deals = [deal for deal in deals if not seen(deal.url)]
+        return cls.hydrate_all(deals, max_workers, fetcher, detail_cache)
 
-        return deals
+    @classmethod
+    def iter_fetch(cls, max_workers: int = 8,
+                   fetcher: Optional[Fetcher] = None,
+                   seen: Optional[Callable[[str], bool]] = None,
+                   feed_cache: Optional[FeedCache] = None,
+                   detail_cache: Optional[DetailCache] = None,
+                   collapse_duplicates: bool = True,
+                   scheduler: Optional[FeedScheduler] = None) -> Iterator[Self]:
+        """
+        Streaming version of fetch(): yields each deal as soon as it is hydrated,
+        in completion order. Feeds and detail pages keep downloading in the
+        background while the caller works on the deals already yielded.
+        """
+        fetcher = fetcher or Fetcher()
+        duplicates = Deduplicator() if collapse_duplicates else None
+        pool = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            feed_futures = {
+                pool.submit(read_feed, url, fetcher, feed_cache=feed_cache, scheduler=scheduler)
+                for url in due_feeds(scheduler)
+            }
+            pending = set(feed_futures)
+
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future not in feed_futures:
+                        yield future.result()
+                        continue
+
+                    # A feed arrived: queue hydration of its new entries
+                    for entry in future.result():
+                        try:
+                            deal = cls(entry)
+                        except Exception as e:
+                            logger.warning(f"Skipping feed entry: {e}")
+                            continue
+                        if duplicates and duplicates.is_duplicate(deal.url, deal.title):
+                            continue
+                        if seen and seen(deal.url):
+                            continue
+                        pending.add(pool.submit(deal.hydrate, fetcher, detail_cache))
+        finally:
+            # Stop queued downloads if the caller leaves early
+            pool.shutdown(wait=False, cancel_futures=True)
+            if feed_cache:
+                feed_cache.save()
+            if scheduler:
+                scheduler.save()
+
+
+# -----------------------------------------------------------
+# READ ONE RSS FEED
+# -----------------------------------------------------------
+def entry_fields(entry: Dict) -> Dict[str, str]:
+    """
+    Keep only the fields ScrapedDeal reads, in a JSON friendly dict
+    """
+    if entry.get("links"):
+        link = entry["links"][0].get("href", "")
+    else:
+        link = entry.get("link", "")
+    return {
+        "title": entry.get("title", ""),
+        "link": link,
+        "summary": entry.get("summary", "") or entry.get("description", ""),
+    }
+
+
+def parse_feed(content: bytes, limit: int = 10) -> List[Dict[str, str]]:
+    """
+    Fast streaming parse of the first `limit` entries,
+    with feedparser as the fallback for feeds it does not understand
+    """
+    try:
+        entries = parse_entries(content, limit)
+        if entries:
+            return entries
+    except (UnsupportedFeed, ParseError):
+        pass
+    return [entry_fields(e) for e in feedparser.parse(content).entries[:limit]]
+
+
+def due_feeds(scheduler: Optional[FeedScheduler] = None) -> List[str]:
+    return scheduler.due(feeds) if scheduler else list(feeds)
+
+
+def read_feed(feed_url: str, fetcher: Fetcher, limit: int = 10,
+              feed_cache: Optional[FeedCache] = None,
+              scheduler: Optional[FeedScheduler] = None) -> List[Dict[str, str]]:
+    try:
+        headers = feed_cache.conditional_headers(feed_url) if feed_cache else {}
+        r = fetcher.get(feed_url, headers=headers)
+
+        # Unchanged feed: reuse the last entries without parsing
+        if r.status_code == 304 and feed_cache:
+            entries = feed_cache.entries(feed_url)[:limit]
+        else:
+            entries = parse_feed(r.content, limit)
+            if feed_cache and r.ok:
+                feed_cache.store(feed_url, r.headers.get("ETag"), r.headers.get("Last-Modified"), entries)
+
+        if scheduler and entries:
+            scheduler.record(feed_url, [e["link"] for e in entries])
+        return entries
+    except Exception as e:
+        logger.warning(f"Could not read feed {feed_url}: {e}")
+        return []
 
 
 # -----------------------------------------------------------
@@ -0,0 +1,116 @@
+import re
+import hashlib
+from typing import Dict, List, Optional, Set, Tuple
+
+from agents.fetching import canonical_url
+
+
+# Words that say nothing about which product a deal is for
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "for", "with", "of", "in", "on", "at", "to", "by",
+    "rs", "inr", "off", "deal", "deals", "offer", "sale", "price", "loot", "buy",
+    "only", "just", "now", "get", "best", "lowest", "flat", "upto", "up", "extra",
+    "amazon", "flipkart", "croma", "myntra", "ajio", "nykaa", "tata", "cliq", "reliance", "digital",
+}
+
+TOKEN = re.compile(r"[a-z0-9]+")
+PRICE = re.compile(r"(?:₹|\brs\.?|\binr)\s*[\d,]+(?:\.\d+)?")
+
+
+def title_tokens(title: str) -> List[str]:
+    """
+    Lowercased words of a title without stopwords and prices,
+    so "boAt Airdopes 141 @ Rs 999 (Amazon)" and "Boat airdopes 141 at ₹999"
+    reduce to the same tokens
+    """
+    return [t for t in TOKEN.findall(PRICE.sub(" ", title.lower())) if t not in STOPWORDS]
+
+
+def title_price(title: str) -> Optional[float]:
+    """
+    The first rupee amount in a title, whatever its spelling
+    """
+    match = PRICE.search(title.lower())
+    if not match:
+        return None
+    amount = re.search(r"\d[\d,]*(?:\.\d+)?", match.group(0)).group(0)
+    return float(amount.replace(",", ""))
+
+
+def _hash64(token: str) -> int:
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def simhash(title: str, bits: int = 64) -> int:
+    """
+    SimHash of a title over its words and word pairs.
+    Titles that share most words end up a few bits apart.
+    """
+    tokens = title_tokens(title)
+    features = tokens + [a + " " + b for a, b in zip(tokens, tokens[1:])]
+    weights = [0] * bits
+    for feature in features:
+        h = _hash64(feature)
+        for i in range(bits):
+            weights[i] += 1 if h >> i & 1 else -1
+    return sum(1 << i for i in range(bits) if weights[i] > 0)
+
+
+class Deduplicator:
+    """
+    Remembers the deals seen in a run and flags repeats:
+    either the same canonical URL, or a title whose SimHash is within
+    `max_distance` bits of one already kept. Titles only match when they
+    keep at least MIN_TOKENS words, and never when they quote different
+    prices, so "iPhone 15 at Rs 59999" and "iPhone 15 at Rs 65999" both stay.
+    Fingerprints are split into max_distance + 1 bands; two fingerprints
+    that close must agree exactly on at least one band, so each lookup
+    only compares against the few titles sharing a band.
+    """
+
+    BITS = 64
+    MIN_TOKENS = 3
+
+    def __init__(self, max_distance: int = 3):
+        self.max_distance = max_distance
+        self.bands = max_distance + 1
+        self.band_width = self.BITS // self.bands
+        self.urls: Set[str] = set()
+        self.buckets: Dict[Tuple[int, int], List[Tuple[int, Optional[float]]]] = {}
+
+    def _band_keys(self, fingerprint: int) -> List[Tuple[int, int]]:
+        mask = (1 << self.band_width) - 1
+        return [(i, fingerprint >> (i * self.band_width) & mask) for i in range(self.bands)]
+
+    def is_duplicate(self, url: str, title: str) -> bool:
+        """
+        True if this deal repeats one seen before; otherwise remember it and return False
+        """
+        key = canonical_url(url)
+        if key in self.urls:
+            return True
+
+        if len(title_tokens(title)) >= self.MIN_TOKENS:
+            fingerprint = simhash(title)
+            price = title_price(title)
+            band_keys = self._band_keys(fingerprint)
+            for band in band_keys:
+                for other, other_price in self.buckets.get(band, []):
+                    if price is not None and other_price is not None and price != other_price:
+                        continue
+                    if bin(fingerprint ^ other).count("1") <= self.max_distance:
+                        return True
+            for band in band_keys:
+                self.buckets.setdefault(band, []).append((fingerprint, price))
+
+        self.urls.add(key)
+        return False
+
+
+def dedupe(deals: list, max_distance: int = 3) -> list:
+    """
+    Keep the first copy of every deal, in order.
+    Works on anything with `url` and `title` attributes.
+    """
+    seen = Deduplicator(max_distance)
+    return [deal for deal in deals if not seen.is_duplicate(deal.url, deal.title)]
@@ -0,0 +1,81 @@
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, Optional
+
+from agents.fetching import canonical_url
+
+
+class DetailCache:
+    """
+    On-disk cache of what was extracted from deal pages.
+    Keyed by a hash of the canonical URL, it stores details, features and
+    raw_price (never the raw HTML). Entries expire after `ttl` seconds and
+    the least recently used ones are evicted beyond `max_entries`, so the
+    file stays bounded when the scanner runs unattended.
+    """
+
+    FILENAME = "detail_cache.db"
+
+    def __init__(self, filename: str = FILENAME, ttl: float = 3 * 24 * 3600, max_entries: int = 5000):
+        """
+        :param filename: sqlite file holding the cache
+        :param ttl: seconds a cached page stays valid
+        :param max_entries: LRU bound on the number of cached pages
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(filename, check_same_thread=False)
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS details ("
+                " key TEXT PRIMARY KEY, url TEXT, details TEXT, features TEXT,"
+                " raw_price REAL, created REAL, accessed REAL)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS details_accessed ON details (accessed)")
+
+    @staticmethod
+    def key(url: str) -> str:
+        return hashlib.sha256(canonical_url(url).encode("utf-8")).hexdigest()
+
+    def get(self, url: str) -> Optional[Dict]:
+        """
+        Return the cached extraction for this page, or None if missing or expired
+        """
+        key = self.key(url)
+        now = time.time()
+        with self._lock, self.conn:
+            row = self.conn.execute(
+                "SELECT details, features, raw_price, created FROM details WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[3] > self.ttl:
+                self.conn.execute("DELETE FROM details WHERE key = ?", (key,))
+                return None
+            self.conn.execute("UPDATE details SET accessed = ? WHERE key = ?", (now, key))
+        return {"details": row[0], "features": row[1], "raw_price": row[2]}
+
+    def put(self, url: str, details: str, features: str, raw_price: Optional[float]) -> None:
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO details VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self.key(url), url, details, features, raw_price, now, now),
+            )
+            self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        self.conn.execute("DELETE FROM details WHERE created < ?", (now - self.ttl,))
+        excess = self.conn.execute("SELECT COUNT(*) FROM details").fetchone()[0] - self.max_entries
+        if excess > 0:
+            self.conn.execute(
+                "DELETE FROM details WHERE key IN "
+                "(SELECT key FROM details ORDER BY accessed LIMIT ?)", (excess,)
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM details").fetchone()[0]
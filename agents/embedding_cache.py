@@ -0,0 +1,155 @@
+import os
+import re
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class EmbeddingCache:
+    """
+    Content-addressed, on-disk store of text embeddings for one model.
+    Vectors are appended as rows of a flat float16 (or float32) file that
+    is read through np.memmap; a small sqlite index maps the hash of
+    (model id, normalized text) to its row. Texts embedded in an earlier
+    run, a notebook, or a memory replay never reach the encoder again.
+    """
+
+    DIRECTORY = "embedding_cache"
+
+    def __init__(self, model_id: str, directory: str = DIRECTORY, dtype=np.float16):
+        """
+        :param model_id: name of the encoder; part of every key and of the file names
+        :param directory: where the vector file and index live
+        :param dtype: storage precision; float16 halves the file at no practical cost for cosine search
+        """
+        self.model_id = model_id
+        self.dtype = np.dtype(dtype)
+        os.makedirs(directory, exist_ok=True)
+        stem = os.path.join(directory, re.sub(r"[^A-Za-z0-9_.-]+", "_", model_id))
+        self.vector_file = f"{stem}.{self.dtype.name}"
+        self._lock = threading.Lock()
+
+        self.conn = sqlite3.connect(f"{stem}.index.db", check_same_thread=False)
+        with self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS rows (key TEXT PRIMARY KEY, row INTEGER)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)")
+        row = self.conn.execute("SELECT value FROM meta WHERE name = 'dim'").fetchone()
+        self.dim: Optional[int] = row[0] if row else None
+        self.rows = self._file_rows()
+        self._matrix = None
+
+    def _file_rows(self) -> int:
+        """
+        Rows come from the file size, not the index, so a write interrupted
+        before the index commit only leaves an unused row behind
+        """
+        if self.dim is None or not os.path.exists(self.vector_file):
+            return 0
+        return os.path.getsize(self.vector_file) // (self.dim * self.dtype.itemsize)
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return " ".join(text.split())
+
+    def key(self, text: str) -> str:
+        payload = self.model_id + "\0" + self.normalize(text)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _view(self) -> np.ndarray:
+        """
+        Memory-mapped view of the vector file, remapped when rows were appended
+        """
+        if self._matrix is None or len(self._matrix) < self.rows:
+            self._matrix = np.memmap(self.vector_file, dtype=self.dtype, mode="r", shape=(self.rows, self.dim))
+        return self._matrix
+
+    def _refresh(self) -> None:
+        """
+        Pick up rows appended by another handle or process
+        """
+        if self.dim is None:
+            row = self.conn.execute("SELECT value FROM meta WHERE name = 'dim'").fetchone()
+            self.dim = row[0] if row else None
+        self.rows = self._file_rows()
+
+    def get_many(self, texts: List[str]) -> Dict[int, np.ndarray]:
+        """
+        :return: {position in texts: float32 vector} for the texts already cached
+        """
+        if not texts:
+            return {}
+        keys = [self.key(text) for text in texts]
+        with self._lock:
+            found = {}
+            unique = list(dict.fromkeys(keys))
+            for start in range(0, len(unique), 500):
+                batch = unique[start:start + 500]
+                marks = ",".join("?" * len(batch))
+                found.update(self.conn.execute(f"SELECT key, row FROM rows WHERE key IN ({marks})", batch))
+            if not found:
+                return {}
+            if max(found.values()) >= self.rows:
+                self._refresh()
+            matrix = self._view()
+        return {i: np.asarray(matrix[found[key]], dtype=np.float32) for i, key in enumerate(keys) if key in found}
+
+    def put_many(self, texts: List[str], vectors: np.ndarray) -> None:
+        """
+        Append the vectors of texts not cached yet. Other handles and
+        processes may append to the same files, so the whole append runs
+        under an exclusive lock on the vector file and an immediate sqlite
+        transaction: row numbers are never handed out twice, and only a
+        truly torn row is ever truncated.
+        """
+        vectors = np.asarray(vectors)
+        with self._lock, open(self.vector_file, "ab") as file:
+            if fcntl is not None:
+                fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                self.conn.execute("BEGIN IMMEDIATE")
+                try:
+                    self._append(file, texts, vectors)
+                    self.conn.commit()
+                except BaseException:
+                    self.conn.rollback()
+                    raise
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(file, fcntl.LOCK_UN)
+
+    def _append(self, file, texts: List[str], vectors: np.ndarray) -> None:
+        self._refresh()
+        if self.dim is None:
+            self.dim = int(vectors.shape[1])
+            self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('dim', ?)", (self.dim,))
+        fresh, seen = [], set()
+        for text, vector in zip(texts, vectors):
+            key = self.key(text)
+            if key in seen or self.conn.execute("SELECT 1 FROM rows WHERE key = ?", (key,)).fetchone():
+                continue
+            seen.add(key)
+            fresh.append((key, vector))
+        if not fresh:
+            return
+        base = self._file_rows()
+        # drop a torn row left by an interrupted write
+        os.truncate(self.vector_file, base * self.dim * self.dtype.itemsize)
+        file.write(np.stack([v for _, v in fresh]).astype(self.dtype).tobytes())
+        file.flush()
+        self.conn.executemany(
+            "INSERT INTO rows VALUES (?, ?)",
+            [(key, base + i) for i, (key, _) in enumerate(fresh)],
+        )
+        self.rows = base + len(fresh)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM rows").fetchone()[0]
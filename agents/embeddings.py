@@ -0,0 +1,124 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, List, Optional
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+from agents.embedding_cache import EmbeddingCache
+
+
+class EmbeddingService:
+    """
+    One MiniLM encoder for the whole process.
+    The frontier and random forest agents both embed the same deal
+    description; the service loads the model once and remembers the
+    most recent vectors, so the second agent gets the first one's result.
+    With an EmbeddingCache, vectors also persist across runs, and the model
+    is only loaded the first time a text is missing from the cache.
+    Concurrent callers asking for the same text share one encode: the
+    later ones wait for the vector the first one is computing.
+    encode() mirrors SentenceTransformer.encode for a list of texts.
+    """
+
+    MODEL = 'sentence-transformers/all-MiniLM-L6-v2'
+
+    _shared: Optional["EmbeddingService"] = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, model_name: str = MODEL, memo_size: int = 1024,
+                 cache: Optional[EmbeddingCache] = None):
+        """
+        :param model_name: the SentenceTransformer to load
+        :param memo_size: how many recent description vectors to keep
+        :param cache: optional on-disk cache consulted before the model
+        """
+        self.model_name = model_name
+        self.memo_size = memo_size
+        self.cache = cache
+        self._model = None
+        self._memo: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        # texts being encoded right now, for callers that arrive meanwhile
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def model(self) -> SentenceTransformer:
+        with self._lock:
+            if self._model is None:
+                self._model = SentenceTransformer(self.model_name)
+            return self._model
+
+    @classmethod
+    def shared(cls) -> "EmbeddingService":
+        """
+        The process-wide instance, created on first use
+        """
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls(cache=EmbeddingCache(cls.MODEL))
+            return cls._shared
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed a list of texts; only those neither seen recently nor cached
+        on disk reach the model, in a single batch
+        :return: a (len(texts), dim) float32 array
+        """
+        vectors = [None] * len(texts)
+        waiting = {}
+        owned = []
+        with self._lock:
+            for i, text in enumerate(texts):
+                if text in self._memo:
+                    self._memo.move_to_end(text)
+                    vectors[i] = self._memo[text]
+                elif text in self._pending:
+                    waiting[i] = self._pending[text]
+                else:
+                    self._pending[text] = Future()
+                    owned.append(text)
+                    waiting[i] = self._pending[text]
+
+        if owned:
+            try:
+                encoded = self._encode_missing(owned)
+            except BaseException as e:
+                with self._lock:
+                    for text in owned:
+                        self._pending.pop(text).set_exception(e)
+                raise
+            with self._lock:
+                for text, vector in encoded.items():
+                    vector.setflags(write=False)
+                    self._memo[text] = vector
+                    self._memo.move_to_end(text)
+                    self._pending.pop(text).set_result(vector)
+                while len(self._memo) > self.memo_size:
+                    self._memo.popitem(last=False)
+
+        for i, future in waiting.items():
+            vectors[i] = future.result()
+
+        return np.stack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+
+    def _encode_missing(self, texts: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Vectors for distinct texts not in the memo: from the disk cache when
+        there, the rest from the model in a single batch
+        """
+        encoded = {}
+        if self.cache is not None:
+            cached = self.cache.get_many(texts)
+            encoded = {texts[j]: vector for j, vector in cached.items()}
+        to_encode = [text for text in texts if text not in encoded]
+        if to_encode:
+            fresh = np.asarray(self.model.encode(to_encode), dtype=np.float32)
+            encoded.update(zip(to_encode, fresh))
+            if self.cache is not None:
+                self.cache.put_many(to_encode, fresh)
+        return encoded
+
+    def encode_one(self, text: str) -> np.ndarray:
+        return self.encode([text])[0]
@@ -1,4 +1,12 @@
+import os
+import time
+import itertools
+import threading
+import numpy as np
 import pandas as pd
+from typing import Dict, List, Optional, Tuple
+from concurrent.futures import Future, wait, FIRST_COMPLETED
+from pydantic import BaseModel
 from sklearn.linear_model import LinearRegression
 import joblib
 
@@ -6,11 +14,126 @@ from agents.agent import Agent
 from agents.specialist_agent import SpecialistAgent
 from agents.frontier_agent import FrontierAgent
 from agents.random_forest_agent import RandomForestAgent
+from agents.embeddings import EmbeddingService
+
+MEMBERS = ['Specialist', 'Frontier', 'RandomForest']
+SUBSET_MODELS_FILENAME = 'ensemble_subset_models.pkl'
+
+
+def member_features(results: Dict[str, List[float]]) -> pd.DataFrame:
+    """
+    Regression inputs for whichever members answered: their prices, in the
+    canonical member order, followed by the row-wise Min and Max
+    """
+    names = [name for name in MEMBERS if name in results]
+    columns = {name: np.asarray(results[name], dtype=float) for name in names}
+    stacked = [columns[name] for name in names]
+    columns['Min'] = np.minimum.reduce(stacked)
+    columns['Max'] = np.maximum.reduce(stacked)
+    return pd.DataFrame(columns)
+
+
+def train_subset_models(X: pd.DataFrame, y, filename: str = SUBSET_MODELS_FILENAME) -> Dict[Tuple[str, ...], LinearRegression]:
+    """
+    Fit one Linear Regression per proper subset of the members, so the ensemble
+    can still answer well when some of them miss their deadline
+    :param X: training frame with a Specialist, Frontier and RandomForest column
+    :param y: the true prices
+    """
+    models = {}
+    for size in range(1, len(MEMBERS)):
+        for subset in itertools.combinations(MEMBERS, size):
+            features = member_features({name: X[name] for name in subset})
+            models[subset] = LinearRegression().fit(features, y)
+    joblib.dump(models, filename)
+    return models
+
+
+def train_ensemble(member_prices: Dict[str, List[float]], y,
+                   filename: str = 'ensemble_model.pkl') -> LinearRegression:
+    """
+    Fit the full ensemble regression and every subset fallback from the
+    members' prices on the same held-out products
+    :param member_prices: {member name: prices} for all of MEMBERS
+    :param y: the true prices
+    """
+    X = member_features(member_prices)
+    model = LinearRegression().fit(X, y)
+    joblib.dump(model, filename)
+    train_subset_models(X, y)
+    return model
+
+
+class DaemonExecutor:
+    """
+    A small executor whose calls run on daemon threads, at most
+    `max_workers` at a time. Unlike ThreadPoolExecutor, whose workers the
+    interpreter joins at exit, a member still running after its deadline
+    (a Modal call may take up to 30 minutes) is abandoned on shutdown
+    instead of holding the process open.
+    """
+
+    def __init__(self, max_workers: int, thread_name_prefix: str = "worker"):
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._prefix = thread_name_prefix
+        self._lock = threading.Lock()
+        self._futures = set()
+        self._shutdown = False
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        future = Future()
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+            self._futures.add(future)
+        future.add_done_callback(self._forget)
+
+        def work():
+            with self._slots:
+                if not future.set_running_or_notify_cancel():
+                    return
+                try:
+                    future.set_result(fn(*args, **kwargs))
+                except BaseException as e:
+                    future.set_exception(e)
+
+        threading.Thread(target=work, name=f"{self._prefix}-{id(future):x}", daemon=True).start()
+        return future
+
+    def _forget(self, future: Future) -> None:
+        with self._lock:
+            self._futures.discard(future)
+
+    def shutdown(self, wait: bool = True, cancel_futures: bool = False) -> None:
+        with self._lock:
+            self._shutdown = True
+            futures = list(self._futures)
+        if cancel_futures:
+            for future in futures:
+                future.cancel()
+        if wait:
+            for future in futures:
+                if not future.cancelled():
+                    future.exception()
+
+
+class EnsembleEstimate(BaseModel):
+    price: float
+    members: List[str]          # the members whose answers were combined
+    timings: Dict[str, float]   # seconds per member; members cut off show the time waited
+
 
 class EnsembleAgent(Agent):
 
     name = "Ensemble Agent"
     color = Agent.YELLOW
+
+    # Seconds to wait for the members before answering with the ones that returned
+    DEADLINE = 60
+    # Room for members still running past an earlier deadline
+    MAX_WORKERS = 12
+    # Members whose pricing also takes the deal domain
+    DOMAIN_AWARE = {'Frontier'}
     
     def __init__(self, collection):
         """
@@ -18,31 +141,137 @@ class EnsembleAgent(Agent):
         And loading the weights of the Ensemble
         """
         self.log("Initializing Ensemble Agent")
+        self.embedder = EmbeddingService.shared()
         self.specialist = SpecialistAgent()
-        self.frontier = FrontierAgent(collection)
-        self.random_forest = RandomForestAgent()
+        self.frontier = FrontierAgent(collection, self.embedder)
+        self.random_forest = RandomForestAgent(self.embedder)
         self.model = joblib.load('ensemble_model.pkl')
+        self.subset_models = {}
+        if os.path.exists(SUBSET_MODELS_FILENAME):
+            self.subset_models = joblib.load(SUBSET_MODELS_FILENAME)
+        else:
+            self.log(f"WARNING: {SUBSET_MODELS_FILENAME} not found - answers missing a member will be plain "
+                     f"averages; run train_ensemble.py to fit the fallback regressors")
+        self.members = {
+            'Specialist': self.specialist,
+            'Frontier': self.frontier,
+            'RandomForest': self.random_forest,
+        }
+        # The members are independent (two are remote I/O), so they run side by side
+        self.pool = DaemonExecutor(max_workers=self.MAX_WORKERS, thread_name_prefix="ensemble")
+        # timings of the most recent call only; concurrent calls get their own from fan_out
+        self.timings: Dict[str, float] = {}
         self.log("Ensemble Agent is ready")
 
-    def price(self, description: str) -> float:
+    def close(self) -> None:
+        """
+        Stop accepting work and drop queued member calls without waiting
+        for the ones already running
+        """
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def _timed(self, name: str, method: str, arg, kwargs: Dict):
+        start = time.perf_counter()
+        if name not in self.DOMAIN_AWARE:
+            kwargs = {}
+        result = getattr(self.members[name], method)(arg, **kwargs)
+        return result, time.perf_counter() - start
+
+    def fan_out(self, method: str, arg, deadline: Optional[float] = None,
+                **kwargs) -> Tuple[Dict, Dict[str, float]]:
+        """
+        Call `method` on every member concurrently and record how long each took.
+        Members still running after `deadline` seconds (or that failed) are left
+        out; if none has answered by then, waits for the first one.
+        :param kwargs: extra arguments for the DOMAIN_AWARE members only
+        :return: {member name: result} for the members that answered,
+            and {member name: seconds} for all of them
+        """
+        start = time.perf_counter()
+        futures = {self.pool.submit(self._timed, name, method, arg, kwargs): name for name in self.members}
+        done, pending = wait(futures, timeout=deadline)
+
+        results, timings = {}, {}
+        while True:
+            for future in done:
+                name = futures[future]
+                try:
+                    results[name], timings[name] = future.result()
+                except Exception as e:
+                    self.log(f"Ensemble Agent member {name} failed: {e}")
+            if results or not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+        for future in pending:
+            timings[futures[future]] = time.perf_counter() - start
+            self.log(f"Ensemble Agent is not waiting for {futures[future]} past the deadline")
+
+        self.timings = timings
+        self.log("Ensemble Agent member timings - " +
+                 ", ".join(f"{name} {seconds:.2f}s" for name, seconds in timings.items()))
+        return results, timings
+
+    def combine(self, results: Dict[str, List[float]]) -> np.ndarray:
+        """
+        Weighted price from whichever members answered: the full ensemble
+        model when all did, else the regression trained on that subset,
+        else (no subset model saved) the plain average of the answers
+        """
+        if not results:
+            raise RuntimeError("No ensemble member returned a price")
+        subset = tuple(name for name in MEMBERS if name in results)
+        X = member_features(results)
+        if len(subset) == len(MEMBERS):
+            y = self.model.predict(X)
+        elif subset in self.subset_models:
+            y = self.subset_models[subset].predict(X)
+        else:
+            y = X[list(subset)].mean(axis=1).to_numpy()
+        return np.maximum(0, y)
+
+    def estimate(self, description: str, deadline: Optional[float] = DEADLINE,
+                 domain: Optional[str] = None) -> EnsembleEstimate:
+        """
+        Price one product within a deadline and report which members were used
+        :param description: the description of a product
+        :param deadline: seconds to wait for the members; None waits for all
+        :param domain: the deal's domain, narrowing the frontier's similar-product search
+        """
+        self.log("Running Ensemble Agent - collaborating with specialist, frontier and random forest agents")
+        results, timings = self.fan_out('price', description, deadline, domain=domain)
+        y = float(self.combine({name: [price] for name, price in results.items()})[0])
+        members = [name for name in MEMBERS if name in results]
+        self.log(f"Ensemble Agent complete - returning ${y:.2f} from {', '.join(members)}")
+        return EnsembleEstimate(price=y, members=members, timings=timings)
+
+    def price(self, description: str, deadline: Optional[float] = DEADLINE, domain: Optional[str] = None) -> float:
         """
         Run this ensemble model
         Ask each of the models to price the product
         Then use the Linear Regression model to return the weighted price
         :param description: the description of a product
+        :param deadline: seconds to wait for the members; None waits for all
+        :param domain: the deal's domain, if known
         :return: an estimate of its price
         """
-        self.log("Running Ensemble Agent - collaborating with specialist, frontier and random forest agents")
-        specialist = self.specialist.price(description)
-        frontier = self.frontier.price(description)
-        random_forest = self.random_forest.price(description)
-        X = pd.DataFrame({
-            'Specialist': [specialist],
-            'Frontier': [frontier],
-            'RandomForest': [random_forest],
-            'Min': [min(specialist, frontier, random_forest)],
-            'Max': [max(specialist, frontier, random_forest)],
-        })
-        y = max(0, self.model.predict(X)[0])
-        self.log(f"Ensemble Agent complete - returning ${y:.2f}")
-        return y
\ No newline at end of file
+        return self.estimate(description, deadline, domain).price
+
+    def price_many(self, descriptions: List[str], deadline: Optional[float] = DEADLINE,
+                   domains: Optional[List[Optional[str]]] = None) -> List[float]:
+        """
+        Batched version of price: each member prices all descriptions in one
+        call, and the Linear Regression runs once over the stacked frame
+        :param descriptions: the descriptions of several products
+        :param deadline: seconds to wait for the members; None waits for all
+        :param domains: the deals' domains, if known
+        :return: an estimate per description
+        """
+        if not descriptions:
+            return []
+        self.log(f"Running Ensemble Agent on a batch of {len(descriptions)}")
+        results, _ = self.fan_out('price_many', descriptions, deadline, domains=domains)
+        y = self.combine(results)
+        self.log(f"Ensemble Agent complete - returning {len(y)} estimates from "
+                 f"{', '.join(name for name in MEMBERS if name in results)}")
+        return [float(v) for v in y]
@@ -0,0 +1,58 @@
+import os
+import json
+import threading
+from typing import Dict, List, Optional
+
+
+class FeedCache:
+    """
+    Small persistent cache of RSS feeds for conditional GETs.
+    For every feed URL it keeps the ETag and Last-Modified validators
+    and the entries parsed from the last full response, so a
+    304 Not Modified reply can be answered without parsing anything.
+    """
+
+    FILENAME = "feed_cache.json"
+
+    def __init__(self, filename: str = FILENAME):
+        self.filename = filename
+        self._lock = threading.Lock()
+        self.feeds: Dict[str, Dict] = {}
+        if os.path.exists(self.filename):
+            try:
+                with open(self.filename, "r") as file:
+                    self.feeds = json.load(file)
+            except (OSError, ValueError):
+                self.feeds = {}
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """
+        Request headers that make the server answer 304 if the feed is unchanged
+        """
+        with self._lock:
+            cached = self.feeds.get(url)
+        if not cached:
+            return {}
+        headers = {}
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("modified"):
+            headers["If-Modified-Since"] = cached["modified"]
+        return headers
+
+    def entries(self, url: str) -> List[Dict[str, str]]:
+        with self._lock:
+            return list(self.feeds.get(url, {}).get("entries", []))
+
+    def store(self, url: str, etag: Optional[str], modified: Optional[str],
+              entries: List[Dict[str, str]]) -> None:
+        with self._lock:
+            self.feeds[url] = {"etag": etag, "modified": modified, "entries": entries}
+
+    def save(self) -> None:
+        with self._lock:
+            data = json.dumps(self.feeds, indent=2)
+        tmp = self.filename + ".tmp"
+        with open(tmp, "w") as file:
+            file.write(data)
+        os.replace(tmp, self.filename)
@@ -0,0 +1,103 @@
+import os
+import json
+import time
+import threading
+from typing import Dict, List, Optional
+
+
+class FeedScheduler:
+    """
+    Decides which feeds are worth polling on this run.
+    For every feed it keeps a smoothed rate of new items per second and
+    polls again after the time it should take for `target_new_items` new
+    items to arrive, clamped between `min_interval` and `max_interval`.
+    Busy feeds are then polled often and quiet ones rarely.
+    """
+
+    FILENAME = "feed_schedule.json"
+    RECENT_LINKS = 50
+
+    def __init__(self, filename: str = FILENAME, min_interval: float = 10 * 60,
+                 max_interval: float = 6 * 3600, target_new_items: float = 3, smoothing: float = 0.3):
+        """
+        :param filename: JSON file holding the per-feed statistics
+        :param min_interval: never poll a feed more often than this (seconds)
+        :param max_interval: always poll a feed at least this often (seconds)
+        :param target_new_items: how many new items we like to find per poll
+        :param smoothing: weight of the latest observation in the arrival rate
+        """
+        self.filename = filename
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.target_new_items = target_new_items
+        self.smoothing = smoothing
+        self._lock = threading.Lock()
+        self.feeds: Dict[str, Dict] = {}
+        if os.path.exists(self.filename):
+            try:
+                with open(self.filename, "r") as file:
+                    self.feeds = json.load(file)
+            except (OSError, ValueError):
+                self.feeds = {}
+
+    def is_due(self, url: str, now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        with self._lock:
+            state = self.feeds.get(url)
+        return state is None or now - state["last_polled"] >= state["interval"]
+
+    def due(self, urls: List[str], now: Optional[float] = None) -> List[str]:
+        """
+        The feeds, in their original order, that should be polled now
+        """
+        now = time.time() if now is None else now
+        return [url for url in urls if self.is_due(url, now)]
+
+    def seconds_until_due(self, urls: List[str], now: Optional[float] = None) -> float:
+        """
+        How long until the next of these feeds is due (0 if one already is)
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            waits = [
+                self.feeds[url]["last_polled"] + self.feeds[url]["interval"] - now if url in self.feeds else 0.0
+                for url in urls
+            ]
+        return max(0.0, min(waits, default=0.0))
+
+    def record(self, url: str, links: List[str], now: Optional[float] = None) -> None:
+        """
+        Record a successful poll of `url` that returned the given entry links
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            state = self.feeds.get(url)
+            if state is None:
+                self.feeds[url] = {
+                    "last_polled": now, "interval": self.min_interval,
+                    "rate": None, "recent": links[:self.RECENT_LINKS],
+                }
+                return
+
+            recent = set(state["recent"])
+            new_items = sum(1 for link in links if link not in recent)
+            elapsed = max(now - state["last_polled"], 1.0)
+            observed = new_items / elapsed
+            if state["rate"] is None:
+                rate = observed
+            else:
+                rate = self.smoothing * observed + (1 - self.smoothing) * state["rate"]
+
+            interval = self.target_new_items / rate if rate > 0 else self.max_interval
+            state["interval"] = min(max(interval, self.min_interval), self.max_interval)
+            state["rate"] = rate
+            state["last_polled"] = now
+            state["recent"] = (links + [link for link in state["recent"] if link not in links])[:self.RECENT_LINKS]
+
+    def save(self) -> None:
+        with self._lock:
+            data = json.dumps(self.feeds, indent=2)
+        tmp = self.filename + ".tmp"
+        with open(tmp, "w") as file:
+            file.write(data)
+        os.replace(tmp, self.filename)
@@ -0,0 +1,232 @@
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+
+import requests
+
+
+DEFAULT_HEADERS = {"User-Agent": "Mozilla/5.0"}
+
+# Query parameters that only track where a click came from
+TRACKING_PARAMS = {
+    "ref", "ref_", "tag", "affid", "affextparam1", "affextparam2", "fbclid", "gclid",
+    "dclid", "msclkid", "igshid", "mc_cid", "mc_eid", "cmpid",
+    "pf_rd_r", "pf_rd_p", "pd_rd_r", "pd_rd_w", "pd_rd_wg", "linkcode", "ascsubtag",
+    "share_id", "sharetype", "utm",
+}
+
+
+def host_of(url: str) -> str:
+    return urlparse(url).netloc.lower()
+
+
+def canonical_url(url: str) -> str:
+    """
+    Normalize a URL so the same page always maps to the same key:
+    lowercase scheme and host, no "www.", no default port, no fragment,
+    no trailing slash, no tracking parameters (utm_*, ref, tag, ...),
+    and the remaining query parameters sorted
+    """
+    parts = urlparse(url.strip())
+    scheme = parts.scheme.lower() or "https"
+    host = parts.netloc.lower()
+    if (scheme, host[-3:]) == ("http", ":80") or (scheme, host[-4:]) == ("https", ":443"):
+        host = host.rsplit(":", 1)[0]
+    if host.startswith("www."):
+        host = host[4:]
+    path = parts.path.rstrip("/") or "/"
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith("utm_")
+    )
+    return urlunparse((scheme, host, path, parts.params, urlencode(query), ""))
+
+
+# -----------------------------------------------------------
+# PER-HOST RATE LIMITER
+# -----------------------------------------------------------
+class HostRateLimiter:
+    """
+    Spaces out requests to the same host by at least `min_interval` seconds.
+    Every host has its own clock, so desidime.com and reddit.com never
+    wait on each other. Safe to share between threads.
+    """
+
+    def __init__(self, min_interval: float = 0.4, intervals: Optional[Dict[str, float]] = None):
+        """
+        :param min_interval: default gap between two requests to one host
+        :param intervals: optional per-host overrides, e.g. {"www.reddit.com": 2.0}
+        """
+        self.min_interval = min_interval
+        self.intervals = dict(intervals or {})
+        self._next_slot: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def interval_for(self, host: str) -> float:
+        return self.intervals.get(host, self.min_interval)
+
+    def wait(self, url: str) -> None:
+        """
+        Block until a request to the host of `url` is allowed.
+        Slots are reserved under the lock, so concurrent callers queue up
+        one interval apart instead of firing together.
+        """
+        host = host_of(url)
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, 0.0))
+            self._next_slot[host] = slot + self.interval_for(host)
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+# -----------------------------------------------------------
+# PER-HOST HEALTH / CIRCUIT BREAKER
+# -----------------------------------------------------------
+class HostUnavailable(Exception):
+    """
+    Raised instead of sending a request to a host whose circuit is open,
+    or when a host answers 429 / 5xx
+    """
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Retry-After is either a number of seconds or an HTTP date
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class HostHealth:
+    """
+    Circuit breaker per host.
+    After `failure_threshold` consecutive failures the host's circuit opens
+    and requests to it are skipped immediately. It stays open for an
+    exponential backoff (or the server's Retry-After, whichever is longer),
+    then lets a single probe request through: success closes the circuit,
+    failure opens it again for twice as long. Failures of requests that
+    were already in flight when the circuit opened do not extend it.
+    """
+
+    def __init__(self, failure_threshold: int = 3, base_backoff: float = 30, max_backoff: float = 1800):
+        """
+        :param failure_threshold: consecutive failures before the circuit opens
+        :param base_backoff: seconds the circuit stays open the first time
+        :param max_backoff: cap on the open time
+        """
+        self.failure_threshold = failure_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, Dict] = {}
+
+    def _state(self, host: str) -> Dict:
+        return self._hosts.setdefault(host, {
+            "consecutive": 0, "trips": 0, "open_until": 0.0, "probing": False,
+            "failures": 0, "skips": 0, "successes": 0,
+        })
+
+    def allow(self, url: str) -> bool:
+        """
+        True if a request to this host may be sent now; counts a skip otherwise
+        """
+        with self._lock:
+            state = self._state(host_of(url))
+            if state["consecutive"] < self.failure_threshold:
+                return True
+            if time.monotonic() >= state["open_until"] and not state["probing"]:
+                state["probing"] = True
+                return True
+            state["skips"] += 1
+            return False
+
+    def record_success(self, url: str) -> None:
+        with self._lock:
+            state = self._state(host_of(url))
+            state["successes"] += 1
+            state["consecutive"] = 0
+            state["trips"] = 0
+            state["probing"] = False
+
+    def record_failure(self, url: str, retry_after: Optional[float] = None) -> None:
+        with self._lock:
+            state = self._state(host_of(url))
+            state["failures"] += 1
+            if state["consecutive"] >= self.failure_threshold and not state["probing"]:
+                # a request sent before the circuit opened: the trip is already counted
+                return
+            state["consecutive"] += 1
+            state["probing"] = False
+            if state["consecutive"] >= self.failure_threshold or retry_after:
+                backoff = min(self.base_backoff * 2 ** state["trips"], self.max_backoff)
+                state["trips"] += 1
+                state["open_until"] = time.monotonic() + max(backoff, retry_after or 0)
+                # a Retry-After opens the circuit right away
+                state["consecutive"] = max(state["consecutive"], self.failure_threshold)
+
+    def stats(self) -> Dict[str, Dict]:
+        """
+        Per-host counters: successes, failures, skips, and seconds until the circuit may close
+        """
+        now = time.monotonic()
+        with self._lock:
+            return {
+                host: {
+                    "successes": state["successes"],
+                    "failures": state["failures"],
+                    "skips": state["skips"],
+                    "open_for": max(0.0, state["open_until"] - now)
+                    if state["consecutive"] >= self.failure_threshold else 0.0,
+                }
+                for host, state in self._hosts.items()
+            }
+
+
+# -----------------------------------------------------------
+# HTTP FETCHER
+# -----------------------------------------------------------
+class Fetcher:
+    """
+    Shared HTTP client for feeds and deal pages.
+    Skips hosts whose circuit is open, applies the per-host rate limit
+    before every request, and reports each outcome to the host tracker.
+    """
+
+    def __init__(self, limiter: Optional[HostRateLimiter] = None,
+                 health: Optional[HostHealth] = None, timeout: float = 10):
+        self.limiter = limiter or HostRateLimiter()
+        self.health = health or HostHealth()
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update(DEFAULT_HEADERS)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        if not self.health.allow(url):
+            raise HostUnavailable(f"{host_of(url)} is backing off")
+
+        self.limiter.wait(url)
+        kwargs.setdefault("timeout", self.timeout)
+        try:
+            r = self.session.get(url, **kwargs)
+        except requests.RequestException:
+            self.health.record_failure(url)
+            raise
+
+        if r.status_code == 429 or r.status_code >= 500:
+            self.health.record_failure(url, parse_retry_after(r.headers.get("Retry-After")))
+            raise HostUnavailable(f"{host_of(url)} answered {r.status_code}")
+
+        self.health.record_success(url)
+        return r
@@ -2,9 +2,11 @@ import os
 import re
 import math
 import json
-from typing import List, Dict
+import threading
+from typing import List, Dict, Optional, Tuple
 from openai import OpenAI
-from sentence_transformers import SentenceTransformer
+from agents.embeddings import EmbeddingService
+from agents.categories import store_categories
 from datasets import load_dataset
 
 
@@ -13,7 +15,11 @@ class FrontierAgent:
     name = "Frontier Agent"
     color = "blue"
 
-    def __init__(self, collection):
+    N_RESULTS = 5
+    # Categories with fewer products than this are searched globally
+    MIN_CATEGORY_SIZE = 500
+
+    def __init__(self, collection, embedder: EmbeddingService = None):
         print("Initializing Frontier Agent")
 
         # Read .env style local OpenAI variables
@@ -36,7 +42,10 @@ class FrontierAgent:
 
         print(f"Frontier Agent is using LOCAL model: {self.MODEL}")
         self.collection = collection
-        self.model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
+        self.embedder = embedder or EmbeddingService.shared()
+        # product count per category set, capped at MIN_CATEGORY_SIZE
+        self.category_sizes: Dict[Tuple[str, ...], int] = {}
+        self._sizes_lock = threading.Lock()
         print("Frontier Agent ready")
 
     def make_context(self, similars: List[str], prices: List[float]) -> str:
@@ -56,24 +65,77 @@ class FrontierAgent:
             {"role": "assistant", "content": "Price is $"}
         ]
 
-    def find_similars(self, description: str):
-        vector = self.model.encode([description])
-        results = self.collection.query(
-            query_embeddings=vector.astype(float).tolist(),
-            n_results=5
-        )
-        docs = results["documents"][0]
-        prices = [m["price"] for m in results["metadatas"][0]]
-        return docs, prices
+    @staticmethod
+    def category_filter(categories: Tuple[str, ...]) -> Dict:
+        if len(categories) == 1:
+            return {"category": categories[0]}
+        return {"category": {"$in": list(categories)}}
+
+    def scope(self, domain: Optional[str]) -> Optional[Tuple[str, ...]]:
+        """
+        The store categories to search for a deal domain, or None to search
+        everything: for "Others", unmapped domains and categories too small
+        to hold good neighbours
+        """
+        categories = tuple(store_categories(domain))
+        if not categories:
+            return None
+        with self._sizes_lock:
+            if categories not in self.category_sizes:
+                # only need to know whether it reaches the minimum, not the full count
+                found = self.collection.get(
+                    where=self.category_filter(categories), include=[], limit=self.MIN_CATEGORY_SIZE
+                )
+                self.category_sizes[categories] = len(found["ids"])
+        return categories if self.category_sizes[categories] >= self.MIN_CATEGORY_SIZE else None
+
+    def find_similars(self, description: str, domain: Optional[str] = None):
+        return self.find_similars_many([description], [domain])[0]
+
+    def find_similars_many(self, descriptions: List[str], domains: Optional[List[Optional[str]]] = None):
+        """
+        One batched encode, then one multi-query lookup per search scope:
+        deals with a known domain only search the matching categories
+        :param domains: the Deal.domain of each description, if known
+        :return: a (docs, prices) pair per description
+        """
+        vectors = self.embedder.encode(descriptions).astype(float)
+        domains = domains or [None] * len(descriptions)
+        by_scope: Dict[Optional[Tuple[str, ...]], List[int]] = {}
+        for i, domain in enumerate(domains):
+            by_scope.setdefault(self.scope(domain), []).append(i)
+
+        similars = [None] * len(descriptions)
+        short = []
+        for categories, indexes in by_scope.items():
+            where = {"where": self.category_filter(categories)} if categories else {}
+            results = self.collection.query(
+                query_embeddings=vectors[indexes].tolist(),
+                n_results=self.N_RESULTS,
+                **where
+            )
+            for i, docs, metadatas in zip(indexes, results["documents"], results["metadatas"]):
+                similars[i] = (docs, [m["price"] for m in metadatas])
+                if categories and len(docs) < self.N_RESULTS:
+                    short.append(i)
+
+        if short:
+            # a scoped search that came back short is repeated globally
+            results = self.collection.query(query_embeddings=vectors[short].tolist(), n_results=self.N_RESULTS)
+            for i, docs, metadatas in zip(short, results["documents"], results["metadatas"]):
+                similars[i] = (docs, [m["price"] for m in metadatas])
+        return similars
 
     def get_price(self, s):
         s = s.replace("$", "").replace(",", "")
         m = re.search(r"[-+]?\d*\.\d+|\d+", s)
         return float(m.group()) if m else 0.0
 
-    def price(self, description: str) -> float:
-        docs, doc_prices = self.find_similars(description)
+    def price(self, description: str, domain: Optional[str] = None) -> float:
+        docs, doc_prices = self.find_similars(description, domain)
+        return self.price_with_context(description, docs, doc_prices)
 
+    def price_with_context(self, description: str, docs: List[str], doc_prices: List[float]) -> float:
         response = self.client.chat.completions.create(
             model=self.MODEL,
             messages=self.messages_for(description, docs, doc_prices),
@@ -86,3 +148,14 @@ class FrontierAgent:
 
         print(f"Predicted price = ${price:.2f}")
         return price
+
+    def price_many(self, descriptions: List[str], domains: Optional[List[Optional[str]]] = None) -> List[float]:
+        """
+        Retrieval is batched; the chat completions still run one per
+        description since the endpoint takes a single conversation
+        """
+        similars = self.find_similars_many(descriptions, domains)
+        return [
+            self.price_with_context(description, docs, doc_prices)
+            for description, (docs, doc_prices) in zip(descriptions, similars)
+        ]
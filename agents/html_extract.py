@@ -0,0 +1,162 @@
+import threading
+from typing import List, Optional, Tuple
+from bs4 import BeautifulSoup, UnicodeDammit
+
+try:
+    import lxml.html
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+
+# -----------------------------------------------------------
+# CANDIDATE CONTAINERS, IN ORDER OF PREFERENCE
+# -----------------------------------------------------------
+# (tag, attribute, value) - attribute None means any element with that tag
+CANDIDATES: List[Tuple[str, Optional[str], Optional[str]]] = [
+    ("div", "class", "deal-desc"),
+    ("div", "class", "content-section"),
+    ("div", "class", "description"),
+    ("div", "id", "content"),
+    ("article", None, None),
+    ("div", "class", "post-content"),
+    ("div", "class", "entry-content"),
+]
+
+# meta tags used when no candidate container exists, in order of preference
+META_CANDIDATES: List[Tuple[str, str]] = [
+    ("name", "description"),
+    ("property", "og:description"),
+]
+
+
+def _attr_matches(attr: str, value: str, actual) -> bool:
+    if actual is None:
+        return False
+    if attr == "class":
+        tokens = actual if isinstance(actual, list) else actual.split()
+        return value in tokens or " ".join(tokens) == value
+    return actual == value
+
+
+class SoupExtractor:
+    """
+    Pure Python backend on html.parser.
+    Walks the tree once and remembers the first element matching each candidate,
+    instead of one find() traversal per candidate.
+    """
+
+    name = "soup"
+
+    def extract(self, html: bytes) -> Optional[str]:
+        """
+        :param html: the raw page
+        :return: text of the preferred container, else the meta description, else None
+        """
+        soup = BeautifulSoup(html, "html.parser")
+        found = [None] * len(CANDIDATES)
+        metas = [None] * len(META_CANDIDATES)
+
+        for tag in soup.find_all(True):
+            for i, (name, attr, value) in enumerate(CANDIDATES):
+                if found[i] is None and tag.name == name and (attr is None or _attr_matches(attr, value, tag.get(attr))):
+                    found[i] = tag
+            if tag.name == "meta":
+                for i, (attr, value) in enumerate(META_CANDIDATES):
+                    if metas[i] is None and tag.get(attr) == value:
+                        metas[i] = tag
+            if found[0] is not None:
+                break
+
+        node = next((x for x in found if x is not None), None)
+        if node is not None:
+            return node.get_text(" ", strip=True)
+        meta = next((x for x in metas if x is not None), None)
+        return meta.get("content", "") if meta is not None else None
+
+
+class LxmlExtractor:
+    """
+    C backend on lxml. A single XPath union returns every candidate and meta
+    tag in one pass over the document; the preferred one is picked afterwards.
+    """
+
+    name = "lxml"
+
+    def __init__(self):
+        parts = []
+        for name, attr, value in CANDIDATES:
+            if attr is None:
+                parts.append(f"//{name}")
+            elif attr == "class":
+                parts.append(f"//{name}[contains(concat(' ', normalize-space(@class), ' '), ' {value} ')]")
+            else:
+                parts.append(f"//{name}[@{attr}='{value}']")
+        for attr, value in META_CANDIDATES:
+            parts.append(f"//meta[@{attr}='{value}']")
+        self.query = " | ".join(parts)
+        # lxml parser objects must not be shared between threads
+        self._local = threading.local()
+
+    def _parser(self, html: bytes):
+        """
+        lxml assumes latin-1 for pages without a charset; pick the encoding
+        the way html.parser would so ₹ survives
+        """
+        try:
+            html.decode("utf-8")
+            encoding = "utf-8"
+        except UnicodeDecodeError:
+            encoding = UnicodeDammit(html, is_html=True).original_encoding
+        parsers = self._local.__dict__.setdefault("parsers", {})
+        if encoding not in parsers:
+            parsers[encoding] = lxml.html.HTMLParser(encoding=encoding)
+        return parsers[encoding]
+
+    @staticmethod
+    def _rank(node) -> Tuple[int, int]:
+        for i, (name, attr, value) in enumerate(CANDIDATES):
+            if node.tag == name and (attr is None or _attr_matches(attr, value, node.get(attr))):
+                return 0, i
+        for i, (attr, value) in enumerate(META_CANDIDATES):
+            if node.tag == "meta" and node.get(attr) == value:
+                return 1, i
+        return 2, 0
+
+    def extract(self, html: bytes) -> Optional[str]:
+        """
+        :param html: the raw page
+        :return: text of the preferred container, else the meta description, else None
+        """
+        if not html or not html.strip():
+            return None
+        if isinstance(html, str):
+            html = html.encode("utf-8")
+        root = lxml.html.fromstring(html, parser=self._parser(html))
+        matches = root.xpath(self.query)
+        if not matches:
+            return None
+
+        # min() keeps document order among equally ranked nodes
+        node = min(matches, key=self._rank)
+        if node.tag == "meta":
+            return node.get("content", "")
+        texts = node.xpath(".//text()[not(ancestor::script) and not(ancestor::style)]")
+        return " ".join(t.strip() for t in texts if t.strip())
+
+
+EXTRACTORS = {"soup": SoupExtractor}
+if HAS_LXML:
+    EXTRACTORS["lxml"] = LxmlExtractor
+
+
+def get_extractor(name: Optional[str] = None):
+    """
+    Return an extraction backend by name.
+    Defaults to lxml when installed, with the pure Python backend as fallback.
+    """
+    if name is None:
+        name = "lxml" if HAS_LXML else "soup"
+    if name not in EXTRACTORS:
+        raise ValueError(f"Unknown or unavailable HTML extractor: {name}")
+    return EXTRACTORS[name]()
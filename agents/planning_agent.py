@@ -1,4 +1,7 @@
-from typing import Optional, List
+from typing import Iterable, Optional, List
+import heapq
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from agents.agent import Agent
 from agents.deals import Deal, Opportunity
 from agents.scanner_agent import ScannerAgent
@@ -7,12 +10,64 @@ from agents.messaging_agent import MessagingAgent
 import random
 
 
+class TopOpportunities:
+    """
+    Keeps the k highest-discount opportunities seen so far.
+    Safe to update from several pricing threads.
+    """
+
+    def __init__(self, k: int = 5):
+        self.k = k
+        self._heap = []
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def add(self, opportunity: Opportunity) -> bool:
+        """
+        :return: True if this opportunity is the new best
+        """
+        with self._lock:
+            is_best = not self._heap or opportunity.discount > max(self._heap)[0]
+            # the counter breaks ties so Opportunity objects are never compared
+            item = (opportunity.discount, self._count, opportunity)
+            self._count += 1
+            if len(self._heap) < self.k:
+                heapq.heappush(self._heap, item)
+            else:
+                heapq.heappushpop(self._heap, item)
+            return is_best
+
+    def ranked(self) -> List[Opportunity]:
+        with self._lock:
+            return [opp for _, _, opp in sorted(self._heap, reverse=True)]
+
+    @property
+    def best(self) -> Optional[Opportunity]:
+        ranked = self.ranked()
+        return ranked[0] if ranked else None
+
+
 class PlanningAgent(Agent):
 
     name = "Planning Agent"
     color = Agent.GREEN
 
+    # Alert on deals with a bigger discount than this. The pipelined plan
+    # alerts as soon as a deal crosses it and again whenever a later deal
+    # beats every earlier one, so one run may send several alerts (at most
+    # one per priced deal); the last one is always the deal returned.
     DEAL_THRESHOLD = 50  # INR
+    USD_TO_INR = 83
+
+    # Cascade pricing: the random forest prices a deal first, and the full
+    # ensemble only runs when that preliminary discount comes within
+    # max(CASCADE_MARGIN, CASCADE_MARGIN_FRACTION * price) of DEAL_THRESHOLD
+    CASCADE = False
+    CASCADE_MARGIN = 1000  # INR
+    CASCADE_MARGIN_FRACTION = 0.25
+
+    # Deals priced at the same time in the pipelined plan
+    MAX_CONCURRENT_DEALS = 4
 
     def __init__(self, collection):
         self.log("Planning Agent is initializing")
@@ -21,17 +76,72 @@ class PlanningAgent(Agent):
         self.messenger = MessagingAgent()
         self.log("Planning Agent is ready")
 
-    def run(self, deal: Deal) -> Opportunity:
+    def close(self) -> None:
+        self.ensemble.close()
+
+    def worth_full_pricing(self, deal: Deal, random_forest_usd: float) -> bool:
+        """
+        True unless the cheap estimate says the deal is clearly not a bargain
+        """
+        preliminary = random_forest_usd * self.USD_TO_INR - deal.price
+        margin = max(self.CASCADE_MARGIN, self.CASCADE_MARGIN_FRACTION * deal.price)
+        return preliminary >= self.DEAL_THRESHOLD - margin
+
+    def run(self, deal: Deal, cascade: Optional[bool] = None) -> Opportunity:
         """
         Estimate INR price & compute INR discount.
+        :param cascade: price with the random forest first and skip the full
+            ensemble for clear non-bargains; defaults to CASCADE
         """
         self.log("Planning Agent is pricing up a potential deal")
+        cascade = self.CASCADE if cascade is None else cascade
+
+        if cascade:
+            random_forest_usd = self.ensemble.random_forest.price(deal.product_description)
+            if not self.worth_full_pricing(deal, random_forest_usd):
+                self.log("Planning Agent cascade: random forest estimate rules this deal out")
+                return self.make_opportunity(deal, random_forest_usd)
     
         # 1. Get estimate from ensemble (USD)
-        estimate_usd = self.ensemble.price(deal.product_description)
+        result = self.ensemble.estimate(deal.product_description, domain=deal.domain)
+        if len(result.members) < len(self.ensemble.members):
+            self.log(f"Planning Agent priced with {', '.join(result.members)} only")
+        return self.make_opportunity(deal, result.price)
+
+    def run_many(self, deals: List[Deal], cascade: Optional[bool] = None) -> List[Opportunity]:
+        """
+        Price several deals with one batched ensemble call.
+        :param cascade: as in run(); the random forest prices the whole batch
+            first and only the remaining deals go to the ensemble
+        """
+        if not deals:
+            return []
+        self.log(f"Planning Agent is pricing up {len(deals)} potential deals")
+        cascade = self.CASCADE if cascade is None else cascade
+        descriptions = [deal.product_description for deal in deals]
+
+        estimates_usd = [None] * len(deals)
+        full = list(range(len(deals)))
+        if cascade:
+            random_forest_usd = self.ensemble.random_forest.price_many(descriptions)
+            full = [i for i in full if self.worth_full_pricing(deals[i], random_forest_usd[i])]
+            for i in set(range(len(deals))) - set(full):
+                estimates_usd[i] = random_forest_usd[i]
+            self.log(f"Planning Agent cascade: {len(full)} of {len(deals)} deals go to the full ensemble")
+
+        if full:
+            estimates = self.ensemble.price_many(
+                [descriptions[i] for i in full], domains=[deals[i].domain for i in full]
+            )
+            for i, estimate in zip(full, estimates):
+                estimates_usd[i] = estimate
+        return [self.make_opportunity(deal, estimate_usd) for deal, estimate_usd in zip(deals, estimates_usd)]
+
+    def make_opportunity(self, deal: Deal, estimate_usd: float) -> Opportunity:
+        self.scanner.seen_index.add(deal.url, kind="priced")
     
         # 2. Convert USD → INR with correct rate
-        estimate = estimate_usd * 83
+        estimate = estimate_usd * self.USD_TO_INR
     
         # 3. Compute discount in INR
         discount = estimate - deal.price
@@ -47,13 +157,67 @@ class PlanningAgent(Agent):
 
 
 
-    def plan(self, memory: List[str] = []) -> Optional[Opportunity]:
+    def plan_pipelined(self, selections: Iterable) -> Optional[Opportunity]:
+        """
+        Price every selected deal on a bounded worker pool as soon as its
+        selection arrives, track the best results as they complete, and
+        alert on a deal over DEAL_THRESHOLD as soon as it is priced, without
+        waiting for the slowest one. A later deal only alerts again if it
+        beats every earlier one (see DEAL_THRESHOLD).
+        """
+        tracker = TopOpportunities()
+
+        # completions are handled on this thread, so a failing alert reaches the caller
+        def handle(future):
+            try:
+                opportunity = future.result()
+            except Exception as e:
+                self.log(f"Planning Agent could not price a deal: {e}")
+                return
+            if tracker.add(opportunity) and opportunity.discount > self.DEAL_THRESHOLD:
+                self.log(f"Planning Agent found a deal over the threshold with discount ₹{opportunity.discount:.2f}")
+                self.messenger.alert(opportunity)
+
+        pending = set()
+        with ThreadPoolExecutor(max_workers=self.MAX_CONCURRENT_DEALS) as pool:
+            for selection in selections:
+                for deal in selection.deals[:5]:
+                    pending.add(pool.submit(self.run, deal))
+                # alert on what finished while the scanner was still streaming
+                for future in [future for future in pending if future.done()]:
+                    pending.discard(future)
+                    handle(future)
+            for future in as_completed(pending):
+                handle(future)
+
+        return tracker.best
+
+    def plan(self, memory: List[str] = [], stream: bool = False, pipelined: bool = True) -> Optional[Opportunity]:
+        """
+        :param stream: price the selection of each scanner window while
+            later deals are still being scraped (up to 5 deals per window)
+        :param pipelined: price deals concurrently and alert as soon as one
+            crosses the threshold; False prices them in one batched call
+        """
 
         self.log("Planning Agent is kicking off a run")
 
-        selection = self.scanner.scan(memory=memory)
-        if selection:
-            opportunities = [self.run(d) for d in selection.deals[:5]]
+        if stream:
+            selections = self.scanner.scan_stream(memory=memory)
+        else:
+            selection = self.scanner.scan(memory=memory)
+            selections = [selection] if selection else []
+
+        if pipelined:
+            best = self.plan_pipelined(selections)
+            if best:
+                self.log(f"Planning Agent has identified the best deal has discount ₹{best.discount:.2f}")
+                self.log("Planning Agent has completed a run")
+            return best
+
+        opportunities = [opp for selection in selections for opp in self.run_many(selection.deals[:5])]
+
+        if opportunities:
 
             # Rank highest discount
             opportunities.sort(key=lambda opp: opp.discount, reverse=True)
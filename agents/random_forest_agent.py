@@ -3,7 +3,7 @@
 import os
 import re
 from typing import List
-from sentence_transformers import SentenceTransformer
+from agents.embeddings import EmbeddingService
 import joblib
 from agents.agent import Agent
 
@@ -14,13 +14,13 @@ class RandomForestAgent(Agent):
     name = "Random Forest Agent"
     color = Agent.MAGENTA
 
-    def __init__(self):
+    def __init__(self, embedder: EmbeddingService = None):
         """
         Initialize this object by loading in the saved model weights
-        and the SentenceTransformer vector encoding model
+        and the shared SentenceTransformer vector encoding service
         """
         self.log("Random Forest Agent is initializing")
-        self.vectorizer = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
+        self.vectorizer = embedder or EmbeddingService.shared()
         self.model = joblib.load('random_forest_model.pkl')
         self.log("Random Forest Agent is ready")
 
@@ -34,4 +34,16 @@ class RandomForestAgent(Agent):
         vector = self.vectorizer.encode([description])
         result = max(0, self.model.predict(vector)[0])
         self.log(f"Random Forest Agent completed - predicting ${result:.2f}")
-        return result
\ No newline at end of file
+        return result
+
+    def price_many(self, descriptions: List[str]) -> List[float]:
+        """
+        Price several items with one encode and one predict over the stacked vectors
+        :param descriptions: the products to be estimated
+        :return: a price per description
+        """
+        self.log(f"Random Forest Agent is starting {len(descriptions)} predictions")
+        vectors = self.vectorizer.encode(descriptions)
+        results = [max(0, float(p)) for p in self.model.predict(vectors)]
+        self.log("Random Forest Agent completed batch")
+        return results
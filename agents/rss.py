@@ -0,0 +1,79 @@
+from typing import Dict, List, Optional
+from xml.etree.ElementTree import XMLPullParser, ParseError
+
+
+class UnsupportedFeed(Exception):
+    """
+    The document is not a plain RSS 2.0 / RSS 1.0 / Atom feed; use feedparser instead
+    """
+
+
+CHUNK_SIZE = 16 * 1024
+FEED_ROOTS = {"rss", "RDF", "feed"}
+
+
+def _local(tag) -> str:
+    """
+    '{http://www.w3.org/2005/Atom}entry' -> 'entry'
+    """
+    if not isinstance(tag, str):
+        return ""
+    return tag.rsplit("}", 1)[-1]
+
+
+def _child_text(elem, *names: str) -> str:
+    for name in names:
+        for child in elem:
+            if _local(child.tag) == name and child.text:
+                return child.text.strip()
+    return ""
+
+
+def _atom_link(elem) -> str:
+    links = [child for child in elem if _local(child.tag) == "link"]
+    for link in links:
+        if link.get("rel", "alternate") == "alternate" and link.get("href"):
+            return link.get("href")
+    return links[0].get("href", "") if links else ""
+
+
+def _entry(elem) -> Dict[str, str]:
+    if _local(elem.tag) == "entry":
+        link = _atom_link(elem)
+        summary = _child_text(elem, "content", "summary")
+    else:
+        link = _child_text(elem, "link")
+        summary = _child_text(elem, "description", "encoded", "summary")
+    return {"title": _child_text(elem, "title"), "link": link, "summary": summary}
+
+
+def parse_entries(content: bytes, limit: Optional[int] = 10) -> List[Dict[str, str]]:
+    """
+    Streaming parser for the RSS/Atom shapes our feeds use.
+    Feeds the document to a pull parser in chunks and stops as soon as
+    `limit` items are read, keeping only title, link and summary.
+    Raises UnsupportedFeed (or ParseError) when the caller should fall back to feedparser.
+    """
+    parser = XMLPullParser(events=("start", "end"))
+    entries: List[Dict[str, str]] = []
+    root_checked = False
+
+    for offset in range(0, len(content), CHUNK_SIZE):
+        parser.feed(content[offset:offset + CHUNK_SIZE])
+        for event, elem in parser.read_events():
+            if event == "start":
+                if not root_checked:
+                    if _local(elem.tag) not in FEED_ROOTS:
+                        raise UnsupportedFeed(f"unexpected root element {elem.tag}")
+                    root_checked = True
+                continue
+            if _local(elem.tag) in ("item", "entry"):
+                entries.append(_entry(elem))
+                elem.clear()
+                if limit is not None and len(entries) >= limit:
+                    return entries
+
+    parser.close()
+    if not root_checked:
+        raise UnsupportedFeed("empty document")
+    return entries
@@ -1,9 +1,15 @@
 import os
 import json
-from typing import Optional, List
+from typing import Iterator, Optional, List, Tuple
+from concurrent.futures import ThreadPoolExecutor
 from openai import OpenAI
-from agents.deals import ScrapedDeal, DealSelection, Deal
+from agents.deals import ScrapedDeal, DealSelection, Deal, feeds, extract_indian_price, extract_indian_prices
 from agents.agent import Agent
+from agents.fetching import Fetcher
+from agents.feed_cache import FeedCache
+from agents.detail_cache import DetailCache
+from agents.feed_scheduler import FeedScheduler
+from agents.seen_index import SeenIndex
 
 
 class ScannerAgent(Agent):
@@ -16,53 +22,256 @@ class ScannerAgent(Agent):
 
     USER_PROMPT_SUFFIX = "\n\nStrictly respond in JSON and include exactly 5 deals, no more."
 
+    # Prompt budgets, in tokens (estimated at ~4 characters per token)
+    CHARS_PER_TOKEN = 4
+    PROMPT_TOKEN_BUDGET = 3000
+    DEAL_TOKEN_BUDGET = 200
+    MAX_PARALLEL_SELECTIONS = 4
+
+    # Heuristic pre-ranking: how many candidates reach the model, and when
+    # a deal is clean enough to skip it altogether
+    PRE_RANK_TOP_K = 30
+    CONFIDENT_MIN_DETAILS = 200
+    FAST_DESCRIPTION_CHARS = 400
+
     name = "Scanner Agent"
     color = Agent.CYAN
 
     def __init__(self):
         self.log("Scanner Agent is initializing")
         self.openai = OpenAI()
+        self.fetcher = Fetcher()
+        self.feed_cache = FeedCache()
+        self.detail_cache = DetailCache()
+        self.scheduler = FeedScheduler()
+        self.seen_index = SeenIndex()
         self.log("Scanner Agent is ready")
 
     def fetch_deals(self, memory) -> List[ScrapedDeal]:
         self.log("Scanner Agent is about to fetch deals from RSS feed")
-        urls = [opp.deal.url for opp in memory]
-        scraped = ScrapedDeal.fetch()
-        result = [s for s in scraped if s.url not in urls]
+        self.seen_index.add_many((opp.deal.url for opp in memory), kind="priced")
+        # Known URLs are dropped before their detail pages are downloaded
+        result = ScrapedDeal.fetch(
+            fetcher=self.fetcher,
+            seen=self.seen_index.__contains__,
+            feed_cache=self.feed_cache,
+            detail_cache=self.detail_cache,
+            scheduler=self.scheduler,
+        )
         self.log(f"Scanner Agent received {len(result)} deals not already scraped")
+        self.log_host_health()
         return result
 
+    def seconds_until_next_scan(self) -> float:
+        """
+        How long until one of the feeds is due again (0 if one already is)
+        """
+        return self.scheduler.seconds_until_due(feeds)
+
+    def log_host_health(self) -> None:
+        for host, stats in self.fetcher.health.stats().items():
+            if stats["failures"] or stats["skips"]:
+                self.log(f"Scanner Agent host {host}: {stats['failures']} failures, "
+                         f"{stats['skips']} skipped, backing off {stats['open_for']:.0f}s")
+
+    def estimate_tokens(self, text: str) -> int:
+        return len(text) // self.CHARS_PER_TOKEN + 1
+
+    def describe_within_budget(self, scrape: ScrapedDeal) -> str:
+        return scrape.describe(max_chars=self.DEAL_TOKEN_BUDGET * self.CHARS_PER_TOKEN)
+
     def make_user_prompt(self, scraped) -> str:
         user_prompt = self.USER_PROMPT_PREFIX
-        user_prompt += '\n\n'.join([scrape.describe() for scrape in scraped])
+        user_prompt += '\n\n'.join([self.describe_within_budget(scrape) for scrape in scraped])
         user_prompt += self.USER_PROMPT_SUFFIX
         return user_prompt
 
-    def scan(self, memory: List[str]=[]) -> Optional[DealSelection]:
+    def shard(self, scraped: List[ScrapedDeal]) -> List[List[ScrapedDeal]]:
+        """
+        Split the deals into chunks whose prompts each fit PROMPT_TOKEN_BUDGET
+        """
+        overhead = self.estimate_tokens(self.SYSTEM_PROMPT + self.USER_PROMPT_PREFIX + self.USER_PROMPT_SUFFIX)
+        room = self.PROMPT_TOKEN_BUDGET - overhead
+        chunks, chunk, used = [], [], 0
+        for scrape in scraped:
+            size = self.estimate_tokens(self.describe_within_budget(scrape)) + 1
+            if chunk and used + size > room:
+                chunks.append(chunk)
+                chunk, used = [], 0
+            chunk.append(scrape)
+            used += size
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+
+    def select(self, scraped: List[ScrapedDeal]) -> DealSelection:
+        """
+        Ask the model to pick the most promising deals out of `scraped`
+        """
+        user_prompt = self.make_user_prompt(scraped)
+        self.log(f"Scanner Agent is calling OpenAI using Structured Output "
+                 f"(~{self.estimate_tokens(user_prompt)} prompt tokens)")
+
+        result = self.openai.beta.chat.completions.parse(
+            model=self.MODEL,
+            messages=[
+                {"role": "system", "content": self.SYSTEM_PROMPT},
+                {"role": "user", "content": user_prompt}
+            ],
+            response_format=DealSelection
+        )
+
+        result = result.choices[0].message.parsed
+        result.deals = [deal for deal in result.deals if deal.price > 0]
+
+        # attach domain from ScrapedDeal to Deal
+        for d in result.deals:
+            for s in scraped:
+                if s.url == d.url:
+                    d.domain = s.category
+
+        self.log(f"Scanner Agent received {len(result.deals)} selected deals with price>0")
+        return result
+
+    def score(self, scrape: ScrapedDeal) -> float:
+        """
+        Cheap usefulness score: a parsed price, a rich description
+        and a known category all make a deal easier to price well
+        """
+        score = 0.0
+        if scrape.raw_price:
+            score += 3
+        score += min(len(scrape.details), 1000) / 250
+        if scrape.features:
+            score += 1
+        if scrape.category != "Others":
+            score += 2
+        return score
+
+    def price_agrees(self, scrape: ScrapedDeal) -> bool:
+        """
+        True if raw_price is very likely the deal price: the feed's own
+        title or summary quotes the same amount, or the page mentions no
+        other amount. Page text alone often leads with the MRP, a struck-out
+        price or a sidebar deal.
+        """
+        headline = extract_indian_price(scrape.title) or extract_indian_price(scrape.summary)
+        if headline is not None:
+            return headline == scrape.raw_price
+        return extract_indian_prices(scrape.details) == [scrape.raw_price]
+
+    def is_confident(self, scrape: ScrapedDeal) -> bool:
+        return (
+            bool(scrape.raw_price) and scrape.raw_price > 0
+            and len(scrape.details) >= self.CONFIDENT_MIN_DETAILS
+            and scrape.category != "Others"
+            and self.price_agrees(scrape)
+        )
+
+    def pre_rank(self, scraped: List[ScrapedDeal]) -> List[ScrapedDeal]:
+        return sorted(scraped, key=self.score, reverse=True)[:self.PRE_RANK_TOP_K]
+
+    def to_deal(self, scrape: ScrapedDeal) -> Deal:
+        description = f"{scrape.title}. {scrape.details}"[:self.FAST_DESCRIPTION_CHARS]
+        return Deal(product_description=description, price=scrape.raw_price, url=scrape.url, domain=scrape.category)
+
+    def select_ranked(self, scraped: List[ScrapedDeal],
+                      map_reduce: bool = True) -> Tuple[DealSelection, List[ScrapedDeal]]:
+        """
+        Rank deals with the heuristics, build the confident ones straight
+        into Deals, and ask the model only to fill the remaining slots
+        from the top PRE_RANK_TOP_K candidates
+        :return: the selection, and the deals that were actually evaluated
+            (the confident ones and those shown to the model)
+        """
+        candidates = self.pre_rank(scraped)
+        fast = [scrape for scrape in candidates if self.is_confident(scrape)][:5]
+        self.log(f"Scanner Agent pre-ranked {len(scraped)} deals: {len(fast)} confident, "
+                 f"{len(candidates) - len(fast)} left for the model")
+        deals = [self.to_deal(scrape) for scrape in fast]
+
+        evaluated = list(fast)
+        rest = [scrape for scrape in candidates if scrape not in fast]
+        if len(deals) < 5 and rest:
+            selection = self.select_map_reduce(rest) if map_reduce else self.select(rest)
+            deals += selection.deals[:5 - len(deals)]
+            evaluated += rest
+        return DealSelection(deals=deals), evaluated
+
+    def mark_seen(self, evaluated: List[ScrapedDeal]) -> None:
+        """
+        Remember the deals that got a full look. Deals whose page could not
+        be fetched (the summary stood in) stay unseen for a later run.
+        """
+        self.seen_index.add_many(scrape.url for scrape in evaluated if scrape.page_fetched)
+
+    def select_map_reduce(self, scraped: List[ScrapedDeal]) -> DealSelection:
+        """
+        Selection for more deals than fit in one prompt.
+        Map: every chunk gets its own selection call, run concurrently.
+        Reduce: the deals picked from all chunks go through one more selection
+        (recursively, if even the finalists do not fit) to produce the final 5.
+        """
+        chunks = self.shard(scraped)
+        if len(chunks) == 1:
+            return self.select(scraped)
+
+        self.log(f"Scanner Agent is selecting from {len(scraped)} deals in {len(chunks)} chunks")
+        with ThreadPoolExecutor(max_workers=self.MAX_PARALLEL_SELECTIONS) as pool:
+            selections = list(pool.map(self.select, chunks))
+
+        picked = {deal.url for selection in selections for deal in selection.deals}
+        finalists = [scrape for scrape in scraped if scrape.url in picked]
+        if not finalists or len(finalists) >= len(scraped):
+            # The model answered with URLs we do not know: keep the chunk picks
+            merged = [deal for selection in selections for deal in selection.deals]
+            return DealSelection(deals=merged[:5])
+        return self.select_map_reduce(finalists)
+
+    def scan(self, memory: List[str]=[], map_reduce: bool = True, pre_rank: bool = True) -> Optional[DealSelection]:
+        """
+        :param map_reduce: shard deals that do not fit one prompt into
+            concurrent selection calls, then merge the picks
+        :param pre_rank: score deals heuristically first; confident deals bypass
+            the model and only the top candidates are sent to it
+        """
         scraped = self.fetch_deals(memory)
         if scraped:
-            user_prompt = self.make_user_prompt(scraped)
-            self.log("Scanner Agent is calling OpenAI using Structured Output")
-
-            result = self.openai.beta.chat.completions.parse(
-                model=self.MODEL,
-                messages=[
-                    {"role": "system", "content": self.SYSTEM_PROMPT},
-                    {"role": "user", "content": user_prompt}
-                ],
-                response_format=DealSelection
-            )
-
-            result = result.choices[0].message.parsed
-            result.deals = [deal for deal in result.deals if deal.price > 0]
-
-            # attach domain from ScrapedDeal to Deal
-            for d in result.deals:
-                for s in scraped:
-                    if s.url == d.url:
-                        d.domain = s.category
-
-            self.log(f"Scanner Agent received {len(result.deals)} selected deals with price>0")
-            return result
+            evaluated = scraped
+            if pre_rank:
+                selection, evaluated = self.select_ranked(scraped, map_reduce)
+            elif map_reduce:
+                selection = self.select_map_reduce(scraped)
+            else:
+                selection = self.select(scraped)
+            # Only once the selection succeeded, so a failed run is retried
+            self.mark_seen(evaluated)
+            return selection
 
         return None
+
+    def scan_stream(self, memory: List[str]=[], window: int = 20) -> Iterator[DealSelection]:
+        """
+        Streaming scan: run a selection on every `window` deals as they are
+        scraped, so selection (and the caller's pricing) overlaps with the
+        downloads still in flight instead of waiting for the slowest feed.
+        """
+        self.log("Scanner Agent is streaming deals from RSS feed")
+        self.seen_index.add_many((opp.deal.url for opp in memory), kind="priced")
+        batch = []
+        for deal in ScrapedDeal.iter_fetch(
+            fetcher=self.fetcher,
+            seen=self.seen_index.__contains__,
+            feed_cache=self.feed_cache,
+            detail_cache=self.detail_cache,
+            scheduler=self.scheduler,
+        ):
+            batch.append(deal)
+            if len(batch) >= window:
+                yield self.select(batch)
+                self.mark_seen(batch)
+                batch = []
+        if batch:
+            yield self.select(batch)
+            self.mark_seen(batch)
+        self.log_host_health()
@@ -0,0 +1,106 @@
+import os
+import math
+import mmap
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Iterable
+
+from agents.fetching import canonical_url
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter stored in a memory-mapped file.
+    Opening it is one mmap call whatever the history size, and bits
+    set by add() go straight to the page cache.
+    """
+
+    def __init__(self, filename: str, capacity: int = 1_000_000, error_rate: float = 0.01):
+        """
+        :param capacity: number of items the filter is sized for
+        :param error_rate: false positive rate at that capacity
+        """
+        self.num_bits = int(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        size = (self.num_bits + 7) // 8
+
+        self.created = not os.path.exists(filename) or os.path.getsize(filename) != size
+        if self.created:
+            with open(filename, "wb") as file:
+                file.truncate(size)
+        self._file = open(filename, "r+b")
+        self.bits = mmap.mmap(self._file.fileno(), size)
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, key: str) -> None:
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    def flush(self) -> None:
+        self.bits.flush()
+
+
+class SeenIndex:
+    """
+    Every deal URL ever scraped or priced, across runs.
+    A Bloom filter answers most "never seen" questions without touching
+    disk; only probable hits are confirmed against an exact sqlite table,
+    so membership stays O(1) as the history grows.
+    """
+
+    FILENAME = "seen_urls"
+
+    def __init__(self, filename: str = FILENAME, capacity: int = 1_000_000, error_rate: float = 0.01):
+        """
+        :param filename: base name; creates <filename>.db and <filename>.bloom
+        """
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(filename + ".db", check_same_thread=False)
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS seen (url TEXT PRIMARY KEY, kind TEXT, first_seen REAL)"
+            )
+        self.bloom = BloomFilter(filename + ".bloom", capacity, error_rate)
+        if self.bloom.created:
+            # One-off rebuild when the filter file is new or was resized
+            for (url,) in self.conn.execute("SELECT url FROM seen"):
+                self.bloom.add(url)
+            self.bloom.flush()
+
+    def __contains__(self, url: str) -> bool:
+        key = canonical_url(url)
+        if key not in self.bloom:
+            return False
+        with self._lock:
+            return self.conn.execute("SELECT 1 FROM seen WHERE url = ?", (key,)).fetchone() is not None
+
+    def add(self, url: str, kind: str = "scraped") -> None:
+        self.add_many([url], kind)
+
+    def add_many(self, urls: Iterable[str], kind: str = "scraped") -> None:
+        """
+        :param kind: why the URL is known, e.g. "scraped" or "priced"
+        """
+        now = time.time()
+        keys = [canonical_url(url) for url in urls if url]
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO seen VALUES (?, ?, ?)", [(key, kind, now) for key in keys]
+            )
+            for key in keys:
+                self.bloom.add(key)
+        self.bloom.flush()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM seen").fetchone()[0]
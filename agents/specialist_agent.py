@@ -1,4 +1,5 @@
 import modal
+from typing import List
 from agents.agent import Agent
 
 
@@ -33,3 +34,12 @@ class SpecialistAgent(Agent):
         self.log(f"Specialist Agent completed - predicting ₹{result:.2f}")
 
         return result
+
+    def price_many(self, descriptions: List[str]) -> List[float]:
+        """
+        Price several items with one Modal map call; results keep input order
+        """
+        self.log(f"Specialist Agent is calling remote fine-tuned model for {len(descriptions)} items")
+        results = list(self.pricer.price.map(descriptions))
+        self.log("Specialist Agent completed batch")
+        return results
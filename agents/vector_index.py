@@ -0,0 +1,404 @@
+import os
+import json
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import hnswlib
+    HAS_HNSWLIB = True
+except ImportError:
+    HAS_HNSWLIB = False
+
+
+# (ids, embeddings, documents, metadatas) for one page of products
+Batch = Tuple[List[str], np.ndarray, List[str], List[Dict]]
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def collection_batches(collection, batch_size: int = 5000) -> Iterable[Batch]:
+    """
+    Page through a Chroma collection with its embeddings
+    """
+    offset = 0
+    while True:
+        page = collection.get(
+            include=["embeddings", "documents", "metadatas"], limit=batch_size, offset=offset
+        )
+        if not len(page["ids"]):
+            return
+        yield page["ids"], np.asarray(page["embeddings"]), page["documents"], page["metadatas"]
+        offset += len(page["ids"])
+
+
+def kmeans(vectors: np.ndarray, k: int, iterations: int = 10, seed: int = 42) -> np.ndarray:
+    """
+    Spherical k-means on unit vectors
+    :return: (k, dim) unit centroids
+    """
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, vectors)
+        empty = np.bincount(assign, minlength=k) == 0
+        # reseed empty clusters with random points
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+        centroids = normalize(sums)
+    return centroids
+
+
+class VectorIndex:
+    """
+    In-process nearest-neighbour index over the product vectors, usable
+    wherever FrontierAgent expects the Chroma collection: query() takes
+    the same arguments and returns the same shape of result.
+
+    The vectors are normalized and stored as a flat float32 file (float16
+    halves it but scans slower) read through np.memmap; documents and
+    metadata sit in sqlite and are only read for the hits. Two index kinds:
+      "ivf"  - numpy inverted file: vectors are grouped by their nearest
+               of ~sqrt(n) k-means centroids, and a query scans only the
+               `nprobe` closest groups
+      "hnsw" - an hnswlib graph, when hnswlib is installed
+    A `where` on the category metadata restricts a query to those
+    categories, as in Chroma; only {"category": name} and
+    {"category": {"$in": [names]}} are understood.
+    Distances are squared L2 between unit vectors (2 - 2 * cosine), as
+    Chroma reports for the default space.
+    """
+
+    DIRECTORY = "products_index"
+    SAMPLE_SIZE = 50_000
+    KINDS = ("ivf", "hnsw")
+
+    def __init__(self, directory: str = DIRECTORY, nprobe: int = 16, ef: int = 64):
+        """
+        Open an index written by build()
+        :param nprobe: IVF groups scanned per query; more is slower and more exact
+        :param ef: HNSW search breadth; more is slower and more exact
+        """
+        self.directory = directory
+        with open(self._path("meta.json"), "r") as file:
+            self.meta = json.load(file)
+        self.kind = self.meta["kind"]
+        self.dim = self.meta["dim"]
+        self.count = self.meta["count"]
+        self.dtype = np.dtype(self.meta["dtype"])
+        self.matrix = np.memmap(self._path("vectors.bin"), dtype=self.dtype, mode="r", shape=(self.count, self.dim))
+        # row in the matrix -> row in the items table
+        self.order = np.load(self._path("order.npy"), mmap_mode="r")
+        self.conn = sqlite3.connect(self._path("items.db"), check_same_thread=False)
+        self._lock = threading.Lock()
+        self._categories: Optional[np.ndarray] = None
+        self._category_names: List[str] = []
+
+        if self.kind == "ivf":
+            self.centroids = np.load(self._path("centroids.npy"))
+            self.offsets = np.load(self._path("offsets.npy"))
+            self.nprobe = min(nprobe, len(self.centroids))
+        elif self.kind == "hnsw":
+            if not HAS_HNSWLIB:
+                raise ImportError("hnswlib is required to open an HNSW index")
+            self.hnsw = hnswlib.Index(space="ip", dim=self.dim)
+            self.hnsw.load_index(self._path("hnsw.bin"), max_elements=self.count)
+            self.hnsw.set_ef(ef)
+        else:
+            raise ValueError(f"Unknown index kind {self.kind}")
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    # -----------------------------------------------------------
+    # BUILDING
+    # -----------------------------------------------------------
+
+    @classmethod
+    def check_kind(cls, kind: str) -> None:
+        if kind not in cls.KINDS:
+            raise ValueError(f"Unknown index kind {kind}; expected one of {', '.join(cls.KINDS)}")
+        if kind == "hnsw" and not HAS_HNSWLIB:
+            raise ImportError("hnswlib is required to build an HNSW index")
+
+    @classmethod
+    def build(cls, batches: Iterable[Batch], directory: str = DIRECTORY, kind: str = "ivf",
+              dtype=np.float32, nlist: Optional[int] = None, **kwargs) -> "VectorIndex":
+        """
+        Write an index from pages of (ids, embeddings, documents, metadatas)
+        :param kind: "ivf" or "hnsw"
+        :param nlist: number of IVF groups; defaults to ~sqrt(n)
+        """
+        cls.check_kind(kind)
+        dtype = np.dtype(dtype)
+        os.makedirs(directory, exist_ok=True)
+        path = lambda name: os.path.join(directory, name)
+        # meta.json goes first so a build that dies half way leaves no index behind
+        for name in ("meta.json", "items.db", "vectors.tmp", "categories.npy", "categories.json"):
+            if os.path.exists(path(name)):
+                os.remove(path(name))
+
+        conn = sqlite3.connect(path("items.db"))
+        conn.execute("CREATE TABLE items (row INTEGER PRIMARY KEY, id TEXT, document TEXT, metadata TEXT)")
+        count, dim = 0, None
+        with open(path("vectors.tmp"), "wb") as file, conn:
+            for ids, embeddings, documents, metadatas in batches:
+                vectors = normalize(embeddings)
+                dim = vectors.shape[1]
+                file.write(vectors.astype(dtype).tobytes())
+                conn.executemany(
+                    "INSERT INTO items VALUES (?, ?, ?, ?)",
+                    [(count + i, ids[i], documents[i], json.dumps(metadatas[i])) for i in range(len(ids))],
+                )
+                count += len(ids)
+        conn.close()
+        if not count:
+            raise ValueError("No vectors to index")
+        unsorted = np.memmap(path("vectors.tmp"), dtype=dtype, mode="r", shape=(count, dim))
+
+        if kind == "ivf":
+            nlist = nlist or max(1, int(np.sqrt(count)))
+            rng = np.random.default_rng(42)
+            sample = unsorted[np.sort(rng.choice(count, min(count, cls.SAMPLE_SIZE), replace=False))]
+            centroids = kmeans(np.asarray(sample, dtype=np.float32), min(nlist, len(sample)))
+            assign = np.concatenate([
+                np.argmax(np.asarray(unsorted[start:start + 50_000], dtype=np.float32) @ centroids.T, axis=1)
+                for start in range(0, count, 50_000)
+            ])
+            # store each group contiguously so a probe is a slice of the memmap
+            order = np.argsort(assign, kind="stable")
+            offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=len(centroids)))])
+            np.save(path("centroids.npy"), centroids)
+            np.save(path("offsets.npy"), offsets)
+        else:
+            order = np.arange(count)
+
+        with open(path("vectors.bin"), "wb") as file:
+            for start in range(0, count, 50_000):
+                file.write(np.asarray(unsorted[order[start:start + 50_000]]).tobytes())
+        del unsorted
+        os.remove(path("vectors.tmp"))
+        np.save(path("order.npy"), order)
+
+        if kind == "hnsw":
+            matrix = np.memmap(path("vectors.bin"), dtype=dtype, mode="r", shape=(count, dim))
+            graph = hnswlib.Index(space="ip", dim=dim)
+            graph.init_index(max_elements=count, ef_construction=200, M=16)
+            for start in range(0, count, 50_000):
+                chunk = np.asarray(matrix[start:start + 50_000], dtype=np.float32)
+                graph.add_items(chunk, np.arange(start, start + len(chunk)))
+            graph.save_index(path("hnsw.bin"))
+            del matrix
+
+        # meta.json last: its presence marks a complete index
+        with open(path("meta.json.tmp"), "w") as file:
+            json.dump({"kind": kind, "dim": dim, "count": count, "dtype": dtype.name}, file)
+        os.replace(path("meta.json.tmp"), path("meta.json"))
+        return cls(directory, **kwargs)
+
+    @classmethod
+    def open_or_build(cls, collection, directory: str = DIRECTORY, kind: str = "ivf", **kwargs) -> "VectorIndex":
+        """
+        Open the index in `directory`, building it from the Chroma collection
+        first if there is none or if it is of another kind
+        """
+        meta_file = os.path.join(directory, "meta.json")
+        if os.path.exists(meta_file):
+            with open(meta_file, "r") as file:
+                existing = json.load(file).get("kind")
+            if existing == kind:
+                return cls(directory, **kwargs)
+            # fail before touching the existing index if the new one cannot be built
+            cls.check_kind(kind)
+        return cls.build(collection_batches(collection), directory, kind=kind, **kwargs)
+
+    # -----------------------------------------------------------
+    # CATEGORY FILTERS
+    # -----------------------------------------------------------
+
+    def categories(self) -> Tuple[np.ndarray, List[str]]:
+        """
+        Category code of every matrix position, and the code names.
+        Read from the metadata once, then kept next to the index.
+        """
+        with self._lock:
+            if self._categories is None:
+                codes_file, names_file = self._path("categories.npy"), self._path("categories.json")
+                if os.path.exists(codes_file) and os.path.exists(names_file):
+                    with open(names_file, "r") as file:
+                        self._category_names = json.load(file)
+                    self._categories = np.load(codes_file)
+                else:
+                    code_of: Dict[str, int] = {}
+                    by_row = np.zeros(self.count, dtype=np.int32)
+                    for row, metadata in self.conn.execute("SELECT row, metadata FROM items"):
+                        category = json.loads(metadata).get("category", "")
+                        by_row[row] = code_of.setdefault(category, len(code_of))
+                    self._categories = by_row[np.asarray(self.order)]
+                    self._category_names = list(code_of)
+                    np.save(codes_file, self._categories)
+                    with open(names_file, "w") as file:
+                        json.dump(self._category_names, file)
+            return self._categories, self._category_names
+
+    def allowed(self, where: Optional[Dict]) -> Optional[np.ndarray]:
+        """
+        :return: a mask over matrix positions matching `where`, None for no filter
+        """
+        if not where:
+            return None
+        condition = where.get("category") if len(where) == 1 else None
+        if isinstance(condition, str):
+            wanted = [condition]
+        elif isinstance(condition, dict) and list(condition) == ["$in"]:
+            wanted = list(condition["$in"])
+        else:
+            raise ValueError(f"Unsupported filter {where}")
+        codes, names = self.categories()
+        return np.isin(codes, [names.index(name) for name in wanted if name in names])
+
+    def get(self, where: Optional[Dict] = None, include: Optional[List[str]] = None,
+            limit: Optional[int] = None) -> Dict[str, List]:
+        """
+        The ids matching `where`, as chromadb's Collection.get(include=[]) returns them
+        """
+        mask = self.allowed(where)
+        rows = np.asarray(self.order) if mask is None else np.asarray(self.order)[mask]
+        rows = rows[:limit]
+        wanted = [int(row) for row in rows]
+        ids = []
+        with self._lock:
+            for start in range(0, len(wanted), 500):
+                batch = wanted[start:start + 500]
+                marks = ",".join("?" * len(batch))
+                ids.extend(id_ for (id_,) in self.conn.execute(f"SELECT id FROM items WHERE row IN ({marks})", batch))
+        return {"ids": ids}
+
+    # -----------------------------------------------------------
+    # SEARCH
+    # -----------------------------------------------------------
+
+    def scan(self, queries: np.ndarray, k: int, positions: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Exact k-NN over the given matrix positions only
+        """
+        result_positions = np.zeros((len(queries), k), dtype=np.int64)
+        result_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        if not len(positions):
+            return result_positions, result_scores
+        similarity = queries @ np.asarray(self.matrix[positions], dtype=np.float32).T
+        top = min(k, len(positions))
+        best = np.argpartition(-similarity, top - 1, axis=1)[:, :top]
+        best = np.take_along_axis(best, np.argsort(-np.take_along_axis(similarity, best, axis=1), axis=1), axis=1)
+        result_positions[:, :top] = positions[best]
+        result_scores[:, :top] = np.take_along_axis(similarity, best, axis=1)
+        return result_positions, result_scores
+
+    def search(self, queries: np.ndarray, k: int, allowed: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Batched k-NN over unit vectors
+        :param allowed: optional mask of the matrix positions that may be returned
+        :return: (positions, cosine similarities), each (len(queries), k), best first;
+            rows with fewer than k matches are padded with -inf scores
+        """
+        queries = normalize(queries)
+        k = min(k, self.count)
+        if self.kind == "hnsw":
+            if allowed is None:
+                labels, distances = self.hnsw.knn_query(queries, k=k)
+                return labels.astype(np.int64), 1 - distances
+            try:
+                labels, distances = self.hnsw.knn_query(queries, k=k, filter=lambda label: bool(allowed[label]))
+                return labels.astype(np.int64), 1 - distances
+            except RuntimeError:
+                # the graph found fewer than k matches: scan the category exactly
+                return self.scan(queries, k, np.flatnonzero(allowed))
+
+        if allowed is not None:
+            matching = np.flatnonzero(allowed)
+            # a category no bigger than the probed groups is cheaper to scan exactly
+            if len(matching) <= self.count * self.nprobe / len(self.centroids):
+                return self.scan(queries, k, matching)
+
+        coarse = queries @ self.centroids.T
+        probes = np.argpartition(-coarse, self.nprobe - 1, axis=1)[:, :self.nprobe]
+        # group-major: each probed group is read once for all the queries probing it
+        probing: Dict[int, List[int]] = {}
+        for i, groups in enumerate(probes):
+            for group in groups:
+                probing.setdefault(int(group), []).append(i)
+
+        found_positions = [[] for _ in queries]
+        found_scores = [[] for _ in queries]
+        for group, members in probing.items():
+            start, end = int(self.offsets[group]), int(self.offsets[group + 1])
+            if end == start:
+                continue
+            block = np.asarray(self.matrix[start:end], dtype=np.float32)
+            candidates = np.arange(start, end)
+            if allowed is not None:
+                keep = allowed[start:end]
+                if not keep.any():
+                    continue
+                block, candidates = block[keep], candidates[keep]
+            similarity = block @ queries[members].T
+            top = min(k, len(candidates))
+            best = np.argpartition(-similarity, top - 1, axis=0)[:top]
+            for j, i in enumerate(members):
+                found_positions[i].append(candidates[best[:, j]])
+                found_scores[i].append(similarity[best[:, j], j])
+
+        positions = np.zeros((len(queries), k), dtype=np.int64)
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        for i in range(len(queries)):
+            if not found_positions[i]:
+                continue
+            candidates = np.concatenate(found_positions[i])
+            similarity = np.concatenate(found_scores[i])
+            order = np.argsort(-similarity)[:k]
+            positions[i, :len(order)] = candidates[order]
+            scores[i, :len(order)] = similarity[order]
+
+        if allowed is not None:
+            # the probed groups held too few matches: scan the category exactly
+            short = np.flatnonzero(~np.isfinite(scores[:, -1]))
+            if len(short):
+                positions[short], scores[short] = self.scan(queries[short], k, matching)
+        return positions, scores
+
+    def query(self, query_embeddings: List[List[float]], n_results: int = 10,
+              where: Optional[Dict] = None) -> Dict[str, List]:
+        """
+        Same call and result shape as chromadb's Collection.query
+        """
+        positions, scores = self.search(np.asarray(query_embeddings), n_results, self.allowed(where))
+        rows = np.asarray(self.order)[positions]
+        wanted = [int(row) for row in np.unique(rows)]
+        with self._lock:
+            items = {}
+            for start in range(0, len(wanted), 500):
+                batch = wanted[start:start + 500]
+                marks = ",".join("?" * len(batch))
+                for row, id_, document, metadata in self.conn.execute(
+                    f"SELECT row, id, document, metadata FROM items WHERE row IN ({marks})", batch
+                ):
+                    items[row] = (id_, document, json.loads(metadata))
+
+        result = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for row_list, score_list in zip(rows, scores):
+            hits = [(items[int(row)], float(score)) for row, score in zip(row_list, score_list) if np.isfinite(score)]
+            result["ids"].append([item[0] for item, _ in hits])
+            result["documents"].append([item[1] for item, _ in hits])
+            result["metadatas"].append([item[2] for item, _ in hits])
+            result["distances"].append([2 - 2 * score for _, score in hits])
+        return result
+
+    def __len__(self) -> int:
+        return self.count
@@ -0,0 +1,67 @@
+"""
+Micro-benchmark for deal page extraction.
+
+Compares the original seven-find() html.parser extraction with the
+single-pass backends in agents/html_extract.py on a synthetic deal page.
+
+    python -m benchmarks.bench_extraction
+"""
+import timeit
+from bs4 import BeautifulSoup
+
+from agents.html_extract import EXTRACTORS
+
+
+def make_page(blocks: int = 400) -> bytes:
+    """
+    A page shaped like a desidime deal: a large header/sidebar, comments,
+    and the deal-desc container near the bottom
+    """
+    filler = "".join(
+        f'<div class="card"><a href="/d/{i}">Other deal {i}</a><p>Save ₹{i * 10} today</p></div>'
+        for i in range(blocks)
+    )
+    return (
+        "<html><head><meta name='description' content='Deal page'>"
+        "<script>var x = 1;</script></head><body>"
+        f"<nav>{filler}</nav><article>Comments and more {filler}</article>"
+        "<div class='deal-desc highlighted'>boAt Airdopes 141 at ₹999 Features 42h playback</div>"
+        "</body></html>"
+    ).encode("utf-8")
+
+
+def legacy_extract(html: bytes):
+    soup = BeautifulSoup(html, "html.parser")
+    candidates = [
+        soup.find("div", {"class": "deal-desc"}),
+        soup.find("div", {"class": "content-section"}),
+        soup.find("div", {"class": "description"}),
+        soup.find("div", {"id": "content"}),
+        soup.find("article"),
+        soup.find("div", {"class": "post-content"}),
+        soup.find("div", {"class": "entry-content"}),
+    ]
+    node = next((x for x in candidates if x), None)
+    if node:
+        return node.get_text(" ", strip=True)
+    meta = soup.find("meta", {"name": "description"}) or soup.find("meta", {"property": "og:description"})
+    return meta.get("content", "") if meta else None
+
+
+def main(number: int = 20):
+    page = make_page()
+    runs = {"legacy": legacy_extract}
+    for name, backend in EXTRACTORS.items():
+        runs[name] = backend().extract
+
+    expected = legacy_extract(page)
+    baseline = None
+    for name, fn in runs.items():
+        assert fn(page) == expected, f"{name} extracted different text"
+        seconds = timeit.timeit(lambda: fn(page), number=number) / number
+        baseline = baseline or seconds
+        print(f"{name:>8}: {seconds * 1000:8.2f} ms/page  ({baseline / seconds:5.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
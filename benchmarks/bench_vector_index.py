@@ -0,0 +1,118 @@
+"""
+Recall and latency of similar-product search.
+
+Compares Chroma's collection.query with the in-process VectorIndex
+backends in agents/vector_index.py. Ground truth is an exact scan of the
+same normalized vectors; queries are stored product vectors with a little
+noise, so they have near but not identical neighbours.
+
+    python -m benchmarks.bench_vector_index                  # products_vectorstore
+    python -m benchmarks.bench_vector_index --synthetic 200000
+"""
+import time
+import argparse
+import tempfile
+import numpy as np
+
+from agents.vector_index import VectorIndex, HAS_HNSWLIB, collection_batches, normalize
+
+
+def synthetic_batches(count: int, dim: int = 384, clusters: int = 500, batch_size: int = 20_000):
+    """
+    Clustered unit vectors, roughly how product embeddings group by kind of product
+    """
+    rng = np.random.default_rng(7)
+    centers = normalize(rng.normal(size=(clusters, dim)))
+    for start in range(0, count, batch_size):
+        n = min(batch_size, count - start)
+        vectors = centers[rng.integers(clusters, size=n)] + 0.6 * rng.normal(size=(n, dim)) / np.sqrt(dim)
+        ids = [str(start + i) for i in range(n)]
+        yield ids, vectors, [f"product {i}" for i in ids], [{"price": 1.0} for _ in ids]
+
+
+def exact_neighbours(index: VectorIndex, queries: np.ndarray, k: int) -> np.ndarray:
+    """
+    Item rows of the true k nearest neighbours, by a full scan
+    """
+    best_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+    best_rows = np.zeros((len(queries), k), dtype=np.int64)
+    for start in range(0, index.count, 50_000):
+        scores = queries @ np.asarray(index.matrix[start:start + 50_000], dtype=np.float32).T
+        scores = np.concatenate([best_scores, scores], axis=1)
+        rows = np.concatenate([best_rows, np.arange(start, start + scores.shape[1] - k)[None].repeat(len(queries), 0)], axis=1)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        best_scores = np.take_along_axis(scores, top, axis=1)
+        best_rows = np.take_along_axis(rows, top, axis=1)
+    return np.asarray(index.order)[best_rows]
+
+
+def make_queries(index: VectorIndex, count: int) -> np.ndarray:
+    rng = np.random.default_rng(11)
+    picks = np.sort(rng.choice(index.count, count, replace=False))
+    base = np.asarray(index.matrix[picks], dtype=np.float32)
+    return normalize(base + 0.5 * rng.normal(size=base.shape) / np.sqrt(base.shape[1]))
+
+
+def measure(name: str, query, queries: np.ndarray, truth: np.ndarray, to_rows, k: int):
+    # one query at a time, as FrontierAgent.price does
+    start = time.perf_counter()
+    for q in queries:
+        query(q[None], k)
+    single = (time.perf_counter() - start) / len(queries)
+    # one call for the whole batch, as price_many does
+    start = time.perf_counter()
+    result = query(queries, k)
+    batched = (time.perf_counter() - start) / len(queries)
+    found = to_rows(result)
+    recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+    print(f"{name:>8}: recall@{k} {recall:.3f}  {single * 1000:7.2f} ms/query  {batched * 1000:7.2f} ms/query batched")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--synthetic", type=int, default=0, help="use this many random vectors instead of Chroma")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--nprobe", type=int, default=16)
+    args = parser.parse_args()
+
+    collection = None
+    if args.synthetic:
+        source = lambda: synthetic_batches(args.synthetic)
+    else:
+        import chromadb
+        collection = chromadb.PersistentClient(path="products_vectorstore").get_or_create_collection("products")
+        source = lambda: collection_batches(collection)
+
+    kinds = ["ivf"] + (["hnsw"] if HAS_HNSWLIB else [])
+    with tempfile.TemporaryDirectory() as directory:
+        indexes = {}
+        for kind in kinds:
+            start = time.perf_counter()
+            indexes[kind] = VectorIndex.build(source(), f"{directory}/{kind}", kind=kind, nprobe=args.nprobe)
+            print(f"built {kind} over {indexes[kind].count} vectors in {time.perf_counter() - start:.1f}s")
+
+        reference = indexes["ivf"]
+        queries = make_queries(reference, args.queries)
+        truth = exact_neighbours(reference, queries, args.k)
+        row_of_id = None
+
+        if collection is not None:
+            with reference._lock:
+                row_of_id = dict(reference.conn.execute("SELECT id, row FROM items"))
+            measure(
+                "chroma",
+                lambda q, k: collection.query(query_embeddings=q.astype(float).tolist(), n_results=k),
+                queries, truth, lambda r: [[row_of_id[i] for i in ids] for ids in r["ids"]], args.k,
+            )
+
+        for kind, index in indexes.items():
+            measure(
+                kind,
+                lambda q, k, index=index: index.search(q, k)[0],
+                queries, truth, lambda positions, index=index: np.asarray(index.order)[positions], args.k,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,18 @@
 import os
 import sys
+import signal
 import logging
 import json
+import argparse
+import threading
+from concurrent.futures import Future
 from typing import List, Optional
 from twilio.rest import Client
 from dotenv import load_dotenv
 import chromadb
 from agents.planning_agent import PlanningAgent
 from agents.deals import Opportunity
+from agents.vector_index import VectorIndex
 from sklearn.manifold import TSNE
 import numpy as np
 
@@ -38,21 +43,48 @@ class DealAgentFramework:
 
     DB = "products_vectorstore"
     MEMORY_FILENAME = "memory.json"
+    VECTOR_INDEX = "products_index"
 
-    def __init__(self):
+    # Daemon mode: bounds on the pause between two cycles (seconds)
+    MIN_CYCLE_INTERVAL = 60
+    MAX_CYCLE_INTERVAL = 30 * 60
+
+    def __init__(self, vector_backend: str = "chroma"):
+        """
+        :param vector_backend: "chroma" queries the Chroma collection for similar
+            products; "ivf" or "hnsw" use an in-process VectorIndex, built from
+            the collection on first use
+        """
         init_logging()
         load_dotenv()
         client = chromadb.PersistentClient(path=self.DB)
         self.memory = self.read_memory()
         self.collection = client.get_or_create_collection('products')
+        self.vector_backend = vector_backend
         self.planner = None
+        self._stop = threading.Event()
+        # memory is shared by runs, the dashboard and write_memory
+        self._memory_lock = threading.RLock()
+        self._init_lock = threading.Lock()
+        # single-flight: the run in progress, which later callers attach to
+        self._run_lock = threading.Lock()
+        self._in_flight: Optional[Future] = None
 
     def init_agents_as_needed(self):
-        if not self.planner:
-            self.log("Initializing Agent Framework")
-            self.planner = PlanningAgent(self.collection)
-            self.log("Agent Framework is ready")
+        if self.planner:
+            return
+        with self._init_lock:
+            if not self.planner:
+                self.log("Initializing Agent Framework")
+                self.planner = PlanningAgent(self.vector_store())
+                self.log("Agent Framework is ready")
         
+    def vector_store(self):
+        if self.vector_backend == "chroma":
+            return self.collection
+        self.log(f"Loading the local {self.vector_backend} vector index")
+        return VectorIndex.open_or_build(self.collection, self.VECTOR_INDEX, kind=self.vector_backend)
+
     def read_memory(self) -> List[Opportunity]:
         if os.path.exists(self.MEMORY_FILENAME):
             with open(self.MEMORY_FILENAME, "r") as file:
@@ -62,23 +94,126 @@ class DealAgentFramework:
         return []
 
     def write_memory(self) -> None:
-        data = [opportunity.dict() for opportunity in self.memory]
-        with open(self.MEMORY_FILENAME, "w") as file:
-            json.dump(data, file, indent=2)
+        with self._memory_lock:
+            data = [opportunity.dict() for opportunity in self.memory]
+            tmp = self.MEMORY_FILENAME + ".tmp"
+            with open(tmp, "w") as file:
+                json.dump(data, file, indent=2)
+            os.replace(tmp, self.MEMORY_FILENAME)
+
+    def remember(self, opportunity: Opportunity) -> List[Opportunity]:
+        """
+        Append to memory and persist it as one step
+        :return: a snapshot of memory including the new opportunity
+        """
+        with self._memory_lock:
+            self.memory.append(opportunity)
+            self.write_memory()
+            return list(self.memory)
 
     def log(self, message: str):
         text = BG_BLUE + WHITE + "[Agent Framework] " + message + RESET
         logging.info(text)
 
     def run(self) -> List[Opportunity]:
+        """
+        Run the planner once. A call made while a run is already in
+        progress does not start another one: it waits for that run and
+        returns its result, so overlapping callers never scrape, price or
+        write memory twice.
+        """
+        with self._run_lock:
+            flight = self._in_flight
+            leader = flight is None
+            if leader:
+                flight = self._in_flight = Future()
+        if not leader:
+            self.log("Agent Framework is already running; waiting for that run")
+            return flight.result()
+
+        try:
+            flight.set_result(self._run_once())
+        except BaseException as e:
+            flight.set_exception(e)
+        finally:
+            with self._run_lock:
+                self._in_flight = None
+        return flight.result()
+
+    def _run_once(self) -> List[Opportunity]:
         self.init_agents_as_needed()
         logging.info("Kicking off Planning Agent")
-        result = self.planner.plan(memory=self.memory)
+        with self._memory_lock:
+            memory = list(self.memory)
+        result = self.planner.plan(memory=memory)
         logging.info(f"Planning Agent has completed and returned: {result}")
         if result:
-            self.memory.append(result)
-            self.write_memory()
-        return self.memory
+            return self.remember(result)
+        with self._memory_lock:
+            return list(self.memory)
+
+    def close(self) -> None:
+        """
+        Release the agents' worker threads; member calls still running are abandoned
+        """
+        if self.planner:
+            self.planner.close()
+
+    def next_cycle_in(self, interval: Optional[float] = None) -> float:
+        """
+        Seconds to sleep before the next cycle: the fixed interval if given,
+        otherwise until the feed scheduler has a feed due, within bounds
+        """
+        if interval is not None:
+            return interval
+        wait = self.planner.scanner.seconds_until_next_scan()
+        return min(max(wait, self.MIN_CYCLE_INTERVAL), self.MAX_CYCLE_INTERVAL)
+
+    def stop(self, *args) -> None:
+        """
+        Ask serve() to exit; the cycle in progress is allowed to finish
+        """
+        if not self._stop.is_set():
+            self.log("Agent Framework is shutting down after the current cycle")
+        self._stop.set()
+
+    def serve(self, interval: Optional[float] = None, max_cycles: Optional[int] = None) -> List[Opportunity]:
+        """
+        Run cycles until stopped, keeping the agents (Chroma, encoders,
+        models, Modal handle) loaded between them. Each cycle only sees
+        what changed: feeds that are not due are not polled, and deals in
+        the seen index are never scraped or priced again.
+        SIGINT and SIGTERM stop the loop once the current cycle completes.
+        :param interval: fixed pause between cycles; None follows the feed schedule
+        :param max_cycles: stop after this many cycles
+        """
+        self.init_agents_as_needed()
+        previous = {}
+        if threading.current_thread() is threading.main_thread():
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                previous[sig] = signal.signal(sig, self.stop)
+
+        self._stop.clear()
+        cycles = 0
+        try:
+            while not self._stop.is_set():
+                try:
+                    self.run()
+                except Exception as e:
+                    self.log(f"Agent Framework cycle failed: {e}")
+                cycles += 1
+                if max_cycles and cycles >= max_cycles:
+                    break
+                wait = self.next_cycle_in(interval)
+                self.log(f"Agent Framework will run again in {wait:.0f}s")
+                self._stop.wait(wait)
+        finally:
+            for sig, handler in previous.items():
+                signal.signal(sig, handler)
+            self.close()
+            self.log(f"Agent Framework has stopped after {cycles} cycles")
+        with self._memory_lock:
+            return list(self.memory)
 
     @classmethod
     def get_plot_data(cls, max_datapoints=10000):
@@ -95,5 +230,16 @@ class DealAgentFramework:
 
 
 if __name__=="__main__":
-    DealAgentFramework().run()
+    parser = argparse.ArgumentParser(description="Find deals and price them")
+    parser.add_argument("--daemon", action="store_true", help="keep running and scan on a schedule")
+    parser.add_argument("--interval", type=float, default=None, help="seconds between cycles in daemon mode")
+    parser.add_argument("--vectors", choices=["chroma", "ivf", "hnsw"], default="chroma",
+                        help="similar product search backend")
+    args = parser.parse_args()
+    framework = DealAgentFramework(vector_backend=args.vectors)
+    if args.daemon:
+        framework.serve(interval=args.interval)
+    else:
+        framework.run()
+        framework.close()
     
\ No newline at end of file
@@ -0,0 +1,43 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from agents.fetching import HostHealth
+
+URL = "https://www.reddit.com/r/IndianGaming/.rss"
+
+
+def test_concurrent_rate_limits_open_the_circuit_once():
+    health = HostHealth(failure_threshold=3, base_backoff=30, max_backoff=1800)
+    # 8 requests in flight together all come back 429 with Retry-After: 5
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda _: health.record_failure(URL, retry_after=5), range(8)))
+
+    stats = health.stats()["www.reddit.com"]
+    assert stats["failures"] == 8
+    assert 25 < stats["open_for"] <= 30
+    assert not health.allow(URL)
+
+
+def test_failures_without_retry_after_open_the_circuit_once():
+    health = HostHealth(failure_threshold=3, base_backoff=30)
+    for _ in range(8):
+        health.record_failure(URL)
+    assert 25 < health.stats()["www.reddit.com"]["open_for"] <= 30
+
+
+def test_failed_probe_doubles_the_backoff():
+    health = HostHealth(failure_threshold=3, base_backoff=0.05)
+    for _ in range(8):
+        health.record_failure(URL, retry_after=0.05)
+    time.sleep(0.06)
+
+    assert health.allow(URL)          # the probe
+    assert not health.allow(URL)      # only one at a time
+    health.record_failure(URL)
+    assert 0.05 < health.stats()["www.reddit.com"]["open_for"] <= 0.1
+
+    time.sleep(0.11)
+    assert health.allow(URL)
+    health.record_success(URL)
+    assert health.stats()["www.reddit.com"]["open_for"] == 0.0
+    assert health.allow(URL)
@@ -0,0 +1,55 @@
+"""
+Fit ensemble_model.pkl and the subset fallbacks in ensemble_subset_models.pkl.
+
+Every member prices the same slice of held-out products from test.pkl
+(see Chroma_setup_RAG.ipynb for obtaining it), and a Linear Regression is
+fit on their answers - once on all members, and once per subset so that
+an answer with a member cut off by the deadline is still a fitted estimate.
+
+    python train_ensemble.py --start 1000 --count 250
+"""
+import pickle
+import argparse
+import chromadb
+from dotenv import load_dotenv
+
+from agents.embeddings import EmbeddingService
+from agents.specialist_agent import SpecialistAgent
+from agents.frontier_agent import FrontierAgent
+from agents.random_forest_agent import RandomForestAgent
+from agents.ensemble_agent import train_ensemble
+
+
+def description(item):
+    text = item.prompt.replace("How much does this cost to the nearest dollar?\n\n", "")
+    return text.split("\n\nPrice is $")[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the ensemble regressions")
+    parser.add_argument("--start", type=int, default=1000, help="first test item used")
+    parser.add_argument("--count", type=int, default=250, help="number of test items used")
+    args = parser.parse_args()
+    load_dotenv()
+
+    with open('test.pkl', 'rb') as file:
+        test = pickle.load(file)
+    items = test[args.start:args.start + args.count]
+    descriptions = [description(item) for item in items]
+    prices = [item.price for item in items]
+
+    collection = chromadb.PersistentClient(path="products_vectorstore").get_or_create_collection('products')
+    embedder = EmbeddingService.shared()
+    members = {
+        'Specialist': SpecialistAgent(),
+        'Frontier': FrontierAgent(collection, embedder),
+        'RandomForest': RandomForestAgent(embedder),
+    }
+    member_prices = {name: member.price_many(descriptions) for name, member in members.items()}
+
+    model = train_ensemble(member_prices, prices)
+    print(f"Trained on {len(items)} items - coefficients {dict(zip(model.feature_names_in_, model.coef_))}")
+
+
+if __name__ == "__main__":
+    main()